@@ -1,8 +1,11 @@
 import os
+import time
 import streamlit as st
 import pandas as pd
 from src.agent import FinancialTweetAgent
-from src.plotting import build_sentiment_bar
+from src.cache import get_cache
+from src.metrics import metrics
+from src.plotting import build_sentiment_bar, build_sentiment_timeseries
 
 # ── Configuración inicial ───────────────────────────────────────────────────
 st.set_page_config(page_title="Financial-Tweet Agent", layout="wide")
@@ -18,6 +21,13 @@ if not twitter_key:
     st.warning("TWITTER_BEARER no configurada. La búsqueda en vivo no funcionará.")
 
 # ── Inicializar agente si no existe ────────────────────────────────────────
+if "agent" not in st.session_state:
+    st.session_state.agent = FinancialTweetAgent(
+        model=os.getenv("MODEL_NAME", "gpt-4o-mini-2024-07-18")
+    )
+    st.session_state.agent.warm_up()   # modelos en segundo plano; la UI no espera
+agent = st.session_state.agent
+
 # ── Sidebar: carga de archivo parquet ─────────────────────────────
 st.sidebar.header("Cargar archivo")
 parquet_file = st.sidebar.file_uploader("Sube un archivo .parquet", type="parquet")
@@ -25,8 +35,18 @@ parquet_file = st.sidebar.file_uploader("Sube un archivo .parquet", type="parque
 # ── Ingesta única (flag en session_state) ─────────────────────────
 if parquet_file and "processed" not in st.session_state:
     st.sidebar.success("✅ Archivo subido")
-    with st.spinner("🧠 Procesando: limpiando, clasificando, generando embeddings..."):
-        agent.ingest(parquet_file)
+    bar = st.sidebar.progress(0.0, text="🧠 Procesando: limpiando, clasificando, generando embeddings...")
+    summary = agent.ingest(
+        parquet_file,
+        progress=lambda done, total: bar.progress(
+            done / max(total, 1), text=f"🧠 Procesando… {done:,}/{total:,} tweets"
+        ),
+        notify=st.info,
+    )
+    st.success(
+        f"✅ Ingesta completada: {summary['rows']:,} documentos procesados, "
+        f"{summary['new']:,} nuevos en la base vectorial ({summary['docs_per_s']:,.0f} docs/s)."
+    )
     st.session_state.processed = True
 
 # Si ya se procesó una vez, sólo avisamos
@@ -37,14 +57,33 @@ elif "processed" in st.session_state:
 else:
     demo_path = "data/tweets_fin_2024.parquet"
     if os.path.exists(demo_path) and "demo_loaded" not in st.session_state:
-        with st.spinner("Cargando dataset de demo..."):
-            agent.ingest(demo_path)
+        bar = st.sidebar.progress(0.0, text="Cargando dataset de demo...")
+        agent.ingest(
+            demo_path,
+            progress=lambda done, total: bar.progress(
+                done / max(total, 1), text=f"Cargando demo… {done:,}/{total:,} tweets"
+            ),
+            notify=st.info,
+        )
         st.sidebar.success("Dataset de demo cargado automáticamente")
         st.session_state.processed = True
         st.session_state.demo_loaded = True
     elif "demo_loaded" not in st.session_state:
         st.stop()   # muestra “Sube un parquet para comenzar”
 
+# ── Caché de modelos (hits / misses) ──────────────────────────────
+with st.sidebar.expander("Caché de modelos", expanded=False):
+    st.json(get_cache().stats())
+    st.caption("Respuestas del LLM (caché semántica)")
+    st.json(agent.answers.stats())
+
+# ── Métricas por etapa (latencias y throughput del proceso) ───────
+with st.sidebar.expander("Métricas del pipeline", expanded=False):
+    stages = metrics.snapshot()["stages"]
+    if stages:
+        st.dataframe(pd.DataFrame(stages).T, use_container_width=True)
+    st.download_button("Exportar (Prometheus)", metrics.export(), file_name="metrics.prom")
+
 # ── Tabs: interfaz principal ───────────────────────────────────────────────
 tab1, tab2, tab3 = st.tabs(["🤖 Chat histórico", "⚡ Live", "📊 Dashboard"])
 
@@ -52,10 +91,21 @@ tab1, tab2, tab3 = st.tabs(["🤖 Chat histórico", "⚡ Live", "📊 Dashboard"
 with tab1:
     st.subheader("Haz una pregunta sobre el corpus histórico")
     question = st.text_input("Pregunta (ej. ¿Qué se dice de NVIDIA?)")
+
+    with st.expander("Filtros de recuperación", expanded=False):
+        f_tickers = st.multiselect("Tickers", agent.mention_counts().head(200).index.tolist())
+        f_sent = st.multiselect("Sentimiento", ["positive", "neutral", "negative"])
+        f_days = st.number_input("Últimos N días (0 = todo)", 0, 365, 0)
+        f_hybrid = st.checkbox("Búsqueda híbrida (BM25 + vectorial)", value=False)
+        f_k = st.slider("Documentos de contexto (k)", 5, 50, 30)
+
+    filters = {"tickers": f_tickers or None, "sentiment": f_sent or None, "hybrid": f_hybrid}
+    if f_days:
+        filters["since"] = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=f_days)
+
     if question and openai_key:
-        with st.spinner("🧠 Pensando..."):
-            answer = agent.insight_hist(question)
-            st.success(answer)
+        # los tokens se pintan según llegan; una respuesta cacheada sale de golpe
+        st.write_stream(agent.insight_hist_stream(question, k=f_k, **filters))
     elif question:
         st.error("GPT está deshabilitado. Configura tu clave.")
 
@@ -64,13 +114,28 @@ with tab2:
     st.subheader("🔍 Buscar tweets en vivo")
     live_query = st.text_input("Consulta live (ej. TSLA OR NVDA)")
     if live_query and twitter_key:
-        with st.spinner("Buscando tweets recientes..."):
-            live_df = agent.live_search(live_query)
+        # El LiveCollector sondea en segundo plano (sólo tweets nuevos por
+        # watermark) y ya los deja etiquetados; aquí sólo se leen.
+        collector = agent.start_collector()
+        collector.watch(live_query)
+        live_df = collector.results(live_query)
+        if live_df.empty:
+            with st.spinner("Primer sondeo de tweets recientes..."):
+                for _ in range(20):
+                    time.sleep(0.5)
+                    live_df = collector.results(live_query)
+                    if not live_df.empty:
+                        break
         if not live_df.empty:
             st.write("Resultados en vivo:")
             st.dataframe(live_df[["text", "topic", "sentiment"]])
         else:
-            st.info("No se encontraron tweets en vivo.")
+            st.info("No se encontraron tweets en vivo (el colector seguirá sondeando).")
+        if collector.last_error:
+            st.caption(f"Último error del colector: {collector.last_error}")
+        st.button("🔄 Actualizar")
+        if openai_key and st.button("🧠 Resumir con GPT"):
+            st.write_stream(agent.insight_live_stream(live_query))
     elif live_query:
         st.error("No tienes TWITTER_BEARER configurado.")
 
@@ -80,14 +145,14 @@ with tab3:
 
     # 🔢 Recuento rápido de menciones
     with st.expander("Ver recuento de menciones por ticker", expanded=False):
-        ticker_counts = (
-            agent.df.explode("tickers")
-                    .dropna(subset=["tickers"])
-                    .value_counts("tickers")
-        )
+        ticker_counts = agent.mention_counts()
         top_n = st.slider("Top-N", 5, 50, 20, key="topn_slider")
         st.dataframe(ticker_counts.head(top_n), use_container_width=True)
 
+        pick = st.selectbox("Ver tweets de", ticker_counts.head(top_n).index.tolist())
+        if pick:
+            st.dataframe(agent.tweets_for(pick)[["text", "sentiment", "topic"]], use_container_width=True)
+
     # —— Controles de la gráfica ——
     min_m = st.slider("Mínimo de menciones por ticker", 10, 300, 50, 10)
     metric = st.selectbox("Métrica a mostrar", ["neg_ratio", "pos_ratio", "total"])
@@ -98,3 +163,21 @@ with tab3:
         st.plotly_chart(chart, use_container_width=True)
     else:
         st.warning("No hay suficientes datos para mostrar.")
+
+    # —— Sentimiento en el tiempo (rollups incrementales) ——
+    st.subheader("Sentimiento por ticker en el tiempo")
+    dated = agent.dated_tickers()
+    with_dates = [t for t in agent.mention_counts().index if t in dated]
+    c1, c2, c3 = st.columns(3)
+    ts_tickers = c1.multiselect("Tickers", with_dates[:200], default=with_dates[:5], key="ts_tickers")
+    ts_grain = c2.selectbox("Granularidad", ["hour", "day", "minute"], key="ts_grain")
+    ts_metric = c3.selectbox("Métrica", ["neg_ratio", "pos_ratio", "total"], key="ts_metric")
+    ts_days = st.slider("Últimos N días", 1, 90, 7, key="ts_days")
+
+    series = agent.sentiment_series(
+        ts_tickers, ts_grain, since=pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=ts_days)
+    )
+    if not series.empty:
+        st.plotly_chart(build_sentiment_timeseries(series, ts_metric), use_container_width=True)
+    else:
+        st.info("Sin tweets fechados en la ventana (llegan con la búsqueda en vivo o un parquet con `created_at`).")
@@ -1,9 +1,29 @@
-import pandas as pd
-import openai
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-from src.vector_db import VectorDB
-from src.data_pipeline import add_labels, clean
-from src.data_pipeline import add_labels
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.answer_cache import AnswerCache, dedup_hits
+from src.cache import shared
+from src.checkpoint import IngestCheckpoint
+from src.corpus import Corpus
+from src.dedup import NearDupIndex
+from src.metrics import metrics
+from src.model_server import MODEL_SERVER_URL, ModelClient, RemoteVectorDB
+from src.rollups import ALL, Rollups
+from src.ticker_index import TickerIndex
+from src.vector_db import VectorDB, make_metadatas
+from src.data_pipeline import (
+    add_labels, clean_series, extract_tickers_series, iter_parquet_batches, parquet_num_rows,
+)
+
+log = logging.getLogger(__name__)
 
 class FinancialTweetAgent:
     """
@@ -11,114 +31,380 @@ class FinancialTweetAgent:
     y expone utilidades para chat histórico, live search y dashboard.
     """
 
-    def __init__(self, model: str = "gpt-4o-mini-2024-07-18"):
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini-2024-07-18",
+        db_path: str = "chroma_db",
+        client=None,
+        server_url: str | None = MODEL_SERVER_URL,
+    ):
         self.model = model
-        self.db = VectorDB()
-        self.df = pd.DataFrame()
-
-    # ────────────────────────────────────────────────────────────────
-    # Ingesta
-    # ────────────────────────────────────────────────────────────────
-    import streamlit as st
-import pandas as pd
-from src.data_pipeline import add_labels
-
-# … resto de la clase …
+        self._client = client            # cliente OpenAI inyectable (tests / stubs)
+        # modo cliente: modelos y Chroma viven en `ModelServer`, compartidos entre sesiones
+        self.remote = ModelClient(server_url) if server_url else None
+        self.db = RemoteVectorDB(self.remote, db_path) if self.remote else VectorDB(db_path)
+        self.answers = AnswerCache()
+        self.db.on_write.append(self.answers.invalidate_near)
+        self.checkpoint = shared(IngestCheckpoint, f"{self.db.path}/ingest_state.json")
+        self.corpus = Corpus()
+        self.tickers = TickerIndex()
+        self.rollups = Rollups()
+        self.lock = threading.RLock()   # corpus/tickers: UI, ingesta y LiveCollector
+        self.collector = None
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent")  # pasos concurrentes
+        self._warm: threading.Thread | None = None
+
+    def warm_up(self, background: bool = True) -> threading.Thread | None:
+        """
+        Precarga chromadb, Mini-LM, FinBERT y el clasificador de temas.
+        Con `background=True` lo hace en un hilo daemon y vuelve al momento,
+        así el dashboard se pinta mientras tanto; el primer uso real espera
+        sólo lo que falte (los cargadores son `load_once`).
+        """
+        if background:
+            if self._warm is None:
+                self._warm = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+                self._warm.start()
+            return self._warm
+        self._warm_up()
+        return None
+
+    def _warm_up(self) -> None:
+        from src.data_pipeline import get_topic_clf
+        from src.inference import finbert_model, finbert_tokenizer, get_engine
+
+        try:
+            self.db.warm_up()
+            if self.remote:   # el servidor ya tiene los modelos cargados
+                return
+            finbert_tokenizer()
+            engine = get_engine()
+            if engine.workers <= 1:   # con pool, cada worker carga su propio modelo
+                finbert_model(engine.backend)
+            get_topic_clf()
+        except Exception as e:   # el precalentamiento es best-effort
+            log.warning(f"warm-up incompleto: {e}")
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Vista DataFrame del corpus en memoria (se materializa al pedirla)."""
+        with self.lock:
+            return self.corpus.to_frame()
 
     # ────────────────────────────────────────────────────────────────
     # Ingesta única por sesión
     # ────────────────────────────────────────────────────────────────
-    def ingest(self, parquet_file) -> None:
+    def ingest(
+        self,
+        parquet_file,
+        *,
+        batch_size: int = 5_000,
+        progress=None,
+        resume: bool = True,
+        id_prefix: str | None = None,
+        notify=log.info,
+        keep_in_memory: bool = True,
+    ) -> dict:
         """
-        Carga un Parquet y lo añade a la base vectorial.
+        Carga un Parquet por lotes (record batches de pyarrow) y lo añade a
+        la base vectorial con memoria acotada.
         - Si el archivo YA contiene columnas `clean`, `sentiment`, `tickers`
           y `embedding`, las respeta y no recalcula nada.
-        - Si falta alguna, las calcula en CPU (puede tardar).
+        - Si falta alguna, las calcula en CPU lote a lote (puede tardar).
         - Deduplica documentos por `doc_id`.
+        - `progress(filas_hechas, filas_totales)` se invoca tras cada lote.
+        - Con `resume=True` continúa desde el último lote confirmado si una
+          ingesta previa del mismo archivo quedó a medias; las filas ya
+          confirmadas se releen para reconstruir el corpus y los agregados
+          de esta sesión, sin volver a pasar por los modelos.
+        - Sin columna `doc_id`, los ids son `<nombre del archivo>:<fila>`
+          (`id_prefix` lo sustituye; "" deja la fila sola), así dos archivos
+          no colisionan en la misma colección.
+        - `notify(mensaje)` recibe los avisos (por defecto `logging`; la app
+          pasa `st.info`). Devuelve un resumen de throughput.
+        - `keep_in_memory=False` sólo escribe en Chroma: no llena el corpus
+          ni los agregados de la sesión (ingesta headless con memoria
+          acotada, ver `src.cli`).
         """
-        df = pd.read_parquet(parquet_file)
+        total = parquet_num_rows(parquet_file)
+        key = self.checkpoint.key(parquet_file)
+        if id_prefix is None:
+            id_prefix = self._id_prefix(parquet_file)
+        start = self.checkpoint.rows_done(key) if resume else 0
 
-        # 1️⃣  Detectar si el archivo está listo
+        # 1️⃣  Detectar si el archivo está listo (el esquema es común a todos los lotes)
         required = {"clean", "sentiment", "tickers", "embedding"}
-        incomplete = required.difference(df.columns)
-
+        incomplete = required.difference(pq.read_schema(parquet_file).names)
+        if start and keep_in_memory:
+            notify(
+                f"Reanudando ingesta en la fila {start:,} de {total:,}; "
+                "recuperando las filas ya confirmadas desde ChromaDB."
+            )
+            self._restore(parquet_file, batch_size, start, id_prefix, bool(incomplete), progress, total)
+        elif start:
+            notify(f"Reanudando ingesta en la fila {start:,} de {total:,}.")
         if incomplete:
-            st.info(
+            notify(
                 f"El archivo no contiene {', '.join(incomplete)}. "
                 "Se calcularán ahora (podría tardar)."
             )
-            df = add_labels(df, skip_if_present=True)
 
-            # embeddings faltan: los calcula VectorDB al llamar .add()
-            has_embed = False
-        else:
-            has_embed = True
-
-        # 2️⃣  Asegurar doc_id
-        if "doc_id" not in df:
-            df["doc_id"] = df.index.astype(str)
-
-        # 3️⃣  Añadir a Chroma (usa embeddings precalculados si existen)
-        if has_embed:
-            self.db.add(
-                ids=df["doc_id"].tolist(),
-                texts=df["clean"].tolist(),
-                embeddings=df["embedding"].tolist(),
+        done, added, new_docs, collapsed, t0 = start, 0, 0, 0, time.perf_counter()
+        for df in iter_parquet_batches(parquet_file, batch_size, start_row=start):
+            # 2️⃣  Asegurar doc_id (posición global de la fila, estable entre lotes)
+            if "doc_id" not in df:
+                df["doc_id"] = id_prefix + df.index.astype(str)
+
+            # Casi-duplicados: sólo el canónico de cada grupo pasa por los modelos
+            seen = df["doc_id"].astype(str).map(self.dedup.__contains__).to_numpy()
+            df, canon = self._label_canonical(df, label=bool(incomplete))
+
+            # 3️⃣  Añadir a Chroma sólo los canónicos (usa embeddings precalculados si existen)
+            uniq = df[canon]
+            stats = self.db.add(
+                ids=uniq["doc_id"].tolist(),
+                texts=uniq["clean"].tolist(),
+                embeddings=None if incomplete else uniq["embedding"].tolist(),
+                metadatas=make_metadatas(uniq),
             )
-        else:
-            self.db.add(df["doc_id"].tolist(), df["clean"].tolist())
-
-        # 4️⃣  Cache en memoria para Dashboard / consultas
-        self.df = pd.concat([self.df, df], ignore_index=True)
+            self._sync_copies(df, canon)
+            collapsed += int((~canon & ~seen).sum())   # copias nuevas, no re-ingestas
+
+            # 4️⃣  Corpus columnar + agregados por ticker, y confirmar el lote
+            if keep_in_memory:
+                with self.lock:
+                    row = self.corpus.append(df, embeddings=None if incomplete else df["embedding"])
+                    self._aggregate(df, row)
+            done += len(df)
+            added += len(df)
+            new_docs += stats["new"]
+            self.checkpoint.commit(key, done, total)
+            if progress:
+                progress(done, total)
+
+        self.checkpoint.finish(key)
+
+        secs = time.perf_counter() - t0
+        return {
+            "rows": added,
+            "new": new_docs,
+            "skipped_rows": start,   # recuperadas de Chroma, no re-etiquetadas
+            "collapsed": collapsed,
+            "seconds": round(secs, 3),
+            "docs_per_s": round(added / max(secs, 1e-9), 1),
+        }
+
+    @staticmethod
+    def _id_prefix(source) -> str:
+        """Prefijo de los doc_id posicionales: nombre del archivo (ruta o UploadedFile)."""
+        name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "upload")
+        return f"{Path(name).stem}:"
+
+    def _restore(self, parquet_file, batch_size: int, start: int, id_prefix: str, incomplete: bool,
+                 progress, total: int) -> None:
+        """
+        Reanudación: las primeras `start` filas ya están en Chroma, pero el
+        corpus y los agregados sólo existían en el proceso que murió. Se
+        releen por lotes y sus etiquetas salen de los metadatos de Chroma
+        (las copias, de su canónico); sólo las filas sin metadatos pasan
+        por `add_labels`, que normalmente responde desde la caché.
+        """
+        for df in iter_parquet_batches(parquet_file, batch_size):
+            df = df[df.index < start]
+            if df.empty:
+                break
+            if "doc_id" not in df:
+                df["doc_id"] = id_prefix + df.index.astype(str)
+            if incomplete:
+                df = self._stored_labels(df)
+            with self.lock:
+                row = self.corpus.append(df, embeddings=None if incomplete else df["embedding"])
+                self._aggregate(df, row)
+            if progress:
+                progress(int(df.index[-1]) + 1, total)
+
+    def _stored_labels(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Sentimiento y tema de filas ya confirmadas, leídos de los metadatos de Chroma."""
+        df = df.copy()
+        if "clean" not in df:
+            df["clean"] = clean_series(df["text"])
+        canon = self.dedup.assign(df["doc_id"].astype(str), df["clean"])   # ya vistos: sólo resuelve
+        meta = self.db.get_metadata(sorted(set(canon)))
+        df["sentiment"] = [meta.get(c, {}).get("sentiment") for c in canon]
+        df["topic"] = [meta.get(c, {}).get("topic") for c in canon]
+        df["tickers"] = extract_tickers_series(df["clean"])
+        missing = (df["sentiment"].isna() | df["topic"].isna()).to_numpy()
+        if missing.any():
+            fixed = add_labels(df[missing].drop(columns=["sentiment", "topic"]), embed=self.db.embed,
+                               engine=self.remote, topics=self.remote.topics if self.remote else None)
+            df.loc[missing, ["sentiment", "topic"]] = fixed[["sentiment", "topic"]].to_numpy()
+        return df
 
-        st.success(f"✅ Ingesta completada: {len(df):,} documentos añadidos.")
+    # ────────────────────────────────────────────────────────────────
+    # Casi-duplicados
+    # ────────────────────────────────────────────────────────────────
+    @property
+    def dedup(self) -> NearDupIndex:
+        """Índice MinHash-LSH persistente, uno por `chroma_db` en el proceso (se carga al primer uso)."""
+        return shared(NearDupIndex, f"{self.db.path}/near_dups")
 
+    def _label_canonical(self, df: pd.DataFrame, label: bool = True):
+        """
+        Agrupa el lote por casi-duplicados (sobre `clean`) y etiqueta sólo
+        el canónico de cada grupo; las copias heredan su sentimiento y tema
+        (los tickers sí se extraen de cada fila). Devuelve el lote completo
+        y la máscara de filas canónicas, que son las únicas que se embeben.
+        """
+        df = df.copy()
+        if "clean" not in df:
+            df["clean"] = clean_series(df["text"])
+        df["canonical"] = self.dedup.assign(df["doc_id"].astype(str), df["clean"])
+        canon = (df["canonical"] == df["doc_id"].astype(str)).to_numpy()
+        if not label:
+            return df, canon
+
+        # Etiquetas de canónicos de lotes anteriores: del corpus o, si no
+        # está en memoria (otra sesión, ingesta sin corpus), de Chroma.
+        # Se etiquetan los canónicos y las copias cuyo canónico no aparece.
+        batch_canon = set(df["doc_id"].astype(str)[canon])
+        earlier = set(df["canonical"][~canon]) - batch_canon
+        with self.lock:
+            rows = {c: self.corpus.row_of[c] for c in earlier if c in self.corpus.row_of}
+            prior = {c: (self.corpus.sentiment_at(r), self.corpus.topic_at(r)) for c, r in rows.items()}
+        if earlier - prior.keys():
+            for c, m in self.db.get_metadata(sorted(earlier - prior.keys())).items():
+                if m.get("sentiment") and m.get("topic"):
+                    prior[c] = (m["sentiment"], m["topic"])
+        prior_labels = pd.DataFrame(list(prior.values()), index=list(prior), columns=["sentiment", "topic"])
+        inherits = ~canon & df["canonical"].map(lambda c: c in prior or c in batch_canon).to_numpy()
+
+        labelled = add_labels(
+            df[~inherits],
+            skip_if_present=True,
+            embed=self.db.embed,
+            engine=self.remote,
+            topics=self.remote.topics if self.remote else None,
+        )
+        if not inherits.any():
+            return labelled, canon
+        source = pd.concat(
+            [labelled.set_index(labelled["doc_id"].astype(str))[["sentiment", "topic"]], prior_labels]
+        )
+        copies = df[inherits].copy()
+        copies["sentiment"] = copies["canonical"].map(source["sentiment"])
+        copies["topic"] = copies["canonical"].map(source["topic"])
+        copies["tickers"] = extract_tickers_series(copies["clean"])
+        return pd.concat([labelled, copies]).loc[df.index], canon
+
+    def _sync_copies(self, df: pd.DataFrame, canon) -> None:
+        """Actualiza `copies` en Chroma para los grupos que crecieron en el lote."""
+        grown = set(df["canonical"][~canon])
+        if grown:
+            self.db.set_copies({c: self.dedup.copies[c] for c in grown})
+
+    def _aggregate(self, df: pd.DataFrame, start_row: int) -> None:
+        """Agregados incrementales de un lote ya añadido al corpus (con `self.lock`)."""
+        self.tickers.update(df["tickers"], df["sentiment"], start_row=start_row)
+        self.rollups.update(df["tickers"], df["sentiment"], df["created_at"] if "created_at" in df else None)
 
     # ────────────────────────────────────────────────────────────────
     # Dashboard helper
     # ────────────────────────────────────────────────────────────────
+    @metrics.timed("pivot")
     def pivot(self, min_m: int = 20) -> pd.DataFrame:
         """Devuelve un DataFrame agregado por ticker y sentimiento."""
-        if self.df.empty or "tickers" not in self.df:
-            return pd.DataFrame()
-
-        piv = (
-            self.df.explode("tickers")
-            .query("tickers != ''")
-            .groupby(["tickers", "sentiment"])
-            .size()
-            .unstack(fill_value=0)
-            .reset_index()
-        )
-
-        for col in ("positive", "neutral", "negative"):
-            if col not in piv:
-                piv[col] = 0
-
-        piv["total"] = piv[["positive", "neutral", "negative"]].sum(axis=1)
-        piv = piv[piv["total"] >= min_m]
-        piv["pos_ratio"] = piv["positive"] / piv["total"]
-        piv["neg_ratio"] = piv["negative"] / piv["total"]
-        return piv.sort_values("neg_ratio", ascending=False)
+        with self.lock:
+            if not len(self.corpus):
+                return pd.DataFrame()
+            return self.tickers.pivot(min_m)
+
+    def mention_counts(self) -> pd.Series:
+        """Recuento de menciones por ticker, leído de los agregados."""
+        with self.lock:
+            return self.tickers.mention_counts()
+
+    def sentiment_series(self, tickers=(ALL,), grain: str = "hour", since=None, until=None) -> pd.DataFrame:
+        """Sentimiento por ticker en el tiempo, leído de los rollups (`grain`: minute/hour/day)."""
+        with self.lock:
+            return self.rollups.frame(tickers, grain, since, until)
+
+    def dated_tickers(self) -> set[str]:
+        """Tickers con al menos un tweet fechado en los rollups."""
+        with self.lock:
+            return set(self.rollups.tickers())
+
+    def tweets_for(self, ticker: str) -> pd.DataFrame:
+        """Tweets del corpus que mencionan `ticker` (índice invertido)."""
+        with self.lock:
+            return self.corpus.to_frame(rows=list(self.tickers.rows_for(ticker)))
 
     # ────────────────────────────────────────────────────────────────
     # Chat histórico (RAG sobre corpus)
     # ────────────────────────────────────────────────────────────────
-    def insight_hist(self, query: str, k: int = 30) -> str:
-        docs = self.db.query(query, k)
-
-        # Buscar en self.df los registros originales para obtener sus sentimientos
-        subset = self.df[self.df["clean"].isin(docs)]
-        pos = (subset["sentiment"] == "positive").sum()
-        neu = (subset["sentiment"] == "neutral").sum()
-        neg = (subset["sentiment"] == "negative").sum()
+    def insight_hist(self, query: str, k: int = 30, **filters) -> str:
+        """
+        RAG sobre el corpus. `filters` se pasan a `VectorDB.query`
+        (tickers, sentiment, topic, since, until, hybrid).
+        Preguntas casi idénticas con los mismos filtros se sirven de
+        `self.answers` sin llamar al LLM mientras no lleguen documentos
+        nuevos cerca de la pregunta.
+        """
+        q_emb, scope, cached = self._cached_answer(query, k, filters)
+        if cached is not None:
+            return cached
+        hits = self.db.query(query, k, query_embedding=q_emb, **filters)
+        answer = f"{self._complete(self._hist_prompt(query, hits))}\n\n📊 Sentiment {self._ratios(hits)}"
+        self._remember(q_emb, scope, answer, hits, k)
+        return answer
+
+    def insight_hist_stream(self, query: str, k: int = 30, **filters):
+        """
+        Igual que `insight_hist`, pero produce los tokens según llegan
+        (para `st.write_stream`). Los ratios de sentimiento se calculan en
+        paralelo a la generación y se añaden al final.
+        """
+        q_emb, scope, cached = self._cached_answer(query, k, filters)
+        if cached is not None:
+            yield cached
+            return
+        hits = self.db.query(query, k, query_embedding=q_emb, **filters)
+        ratios = self._pool.submit(self._ratios, hits)
+
+        parts = []
+        for token in self._complete_stream(self._hist_prompt(query, hits)):
+            parts.append(token)
+            yield token
+        tail = f"\n\n📊 Sentiment {ratios.result()}"
+        yield tail
+        self._remember(q_emb, scope, "".join(parts).strip() + tail, hits, k)
+
+    def _cached_answer(self, query: str, k: int, filters: dict):
+        q_emb = self.db.embed_query(query)
+        scope = self._scope("hist", k, filters)
+        cached = self.answers.get(q_emb, scope)
+        metrics.inc("answer_cache_hit" if cached is not None else "answer_cache_miss")
+        return q_emb, scope, cached
+
+    def _remember(self, q_emb, scope: str, answer: str, hits: list[dict], k: int) -> None:
+        dists = [h["distance"] for h in hits if h["distance"] is not None]
+        self.answers.put(q_emb, answer, scope, radius=max(dists) if len(dists) >= k else 2.0)
+
+    def _ratios(self, hits: list[dict]) -> str:
+        # Sentimiento de cada hit: metadatos de Chroma o, en documentos
+        # antiguos sin metadatos, lookup O(k) en el corpus por doc_id
+        sents = [self._hit_sentiment(h) for h in hits]
+        pos = sents.count("positive")
+        neu = sents.count("neutral")
+        neg = sents.count("negative")
         total = max(pos + neu + neg, 1)
+        return f"(+ {pos/total:.2f} | = {neu/total:.2f} | − {neg/total:.2f})"
 
-        ratios = f"(+ {pos/total:.2f} | = {neu/total:.2f} | − {neg/total:.2f})"
-
-        context = "\n".join(t[:280] for t in docs)
-
-        prompt = f"""
+    @staticmethod
+    def _hist_prompt(query: str, hits: list[dict]) -> str:
+        context = "\n".join(
+            f"[tweet_id {h['id']}]{_copies_tag(h)} {h['document'][:280]}" for h in dedup_hits(hits)
+        )
+        return f"""
 Usa SOLO el contexto siguiente para responder.
 Contexto:
 {context}
@@ -127,15 +413,67 @@ Pregunta: {query}
 Responde en español de forma clara, cita tweet_id cuando corresponda y menciona si predomina un tono positivo o negativo.
 """.strip()
 
-        response = openai.chat.completions.create(
+    @staticmethod
+    def _scope(kind: str, k: int, filters: dict) -> str:
+        """Clave de la caché de respuestas: tipo, k y filtros normalizados."""
+        norm = {}
+        for name, v in filters.items():
+            if v is None or v is False or (isinstance(v, (list, tuple, set)) and not v):
+                continue
+            if name in ("since", "until"):
+                v = pd.Timestamp(v).floor("h").isoformat()   # "últimos N días" se mueve cada segundo
+            elif isinstance(v, (list, tuple, set)):
+                v = sorted(map(str, v))
+            norm[name] = v
+        return json.dumps([kind, k, norm], sort_keys=True, default=str)
+
+    # ────────────────────────────────────────────────────────────────
+    # LLM
+    # ────────────────────────────────────────────────────────────────
+    @property
+    def client(self):
+        """Cliente OpenAI; por defecto el módulo `openai` (lee OPENAI_API_KEY)."""
+        if self._client is None:
+            import openai
+
+            self._client = openai
+        return self._client
+
+    @metrics.timed("llm")
+    def _complete(self, prompt: str, temperature: float = 0.3) -> str:
+        response = self.client.chat.completions.create(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
+            temperature=temperature,
         )
+        return response.choices[0].message.content.strip()
 
-        answer = response.choices[0].message.content.strip()
-        return f"{answer}\n\n📊 Sentiment {ratios}"
-
+    def _complete_stream(self, prompt: str, temperature: float = 0.3):
+        """Tokens de la respuesta según los envía la API (`stream=True`)."""
+        t0 = first = time.perf_counter()
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first == t0:
+                        first = time.perf_counter()
+                        metrics.observe("llm_first_token", first - t0)
+                    yield chunk.choices[0].delta.content
+        finally:
+            metrics.observe("llm", time.perf_counter() - t0)
+
+    def _hit_sentiment(self, hit: dict) -> str | None:
+        sent = hit["metadata"].get("sentiment")
+        if sent is None:
+            row = self.corpus.row_of.get(hit["id"])
+            if row is not None:
+                sent = self.corpus.sentiment_at(row)
+        return sent
 
     # ────────────────────────────────────────────────────────────────
     # Live search (Twitter) + ingest
@@ -143,24 +481,79 @@ Responde en español de forma clara, cita tweet_id cuando corresponda y menciona
     def live_search(self, query: str, n: int = 30) -> pd.DataFrame:
         from src.twitter_live import search
 
-        live = pd.DataFrame(search(query, n=n))
+        return self.ingest_live(pd.DataFrame(search(query, n=n)))
+
+    def ingest_live(self, live: pd.DataFrame) -> pd.DataFrame:
+        """
+        Etiqueta, embebe y confirma tweets recién descargados. Sólo los que
+        no están ya en el corpus pasan por FinBERT/Mini-LM; los conocidos
+        se devuelven con las etiquetas que ya tenían. Seguro desde el hilo
+        de `LiveCollector`: el trabajo pesado va fuera de `self.lock`.
+        """
         if live.empty:
             return pd.DataFrame()
-
         if "doc_id" not in live:
             live["doc_id"] = live.index.astype(str)
-
-        live = add_labels(live)  # siempre etiqueta porque viene sin procesar
-        self.db.add(live["doc_id"].tolist(), live["clean"].tolist())
-        self.df = pd.concat([self.df, live], ignore_index=True)
-        return live
+        live = live.assign(doc_id=live["doc_id"].astype(str)).drop_duplicates("doc_id")
+        live = live.reset_index(drop=True)
+
+        with self.lock:
+            known = live["doc_id"].map(self.corpus.row_of)
+        fresh = live[known.isna()]
+        if not fresh.empty:
+            fresh, canon = self._label_canonical(fresh)  # siempre etiqueta porque viene sin procesar
+            uniq = fresh[canon]
+            self.db.add(uniq["doc_id"].tolist(), uniq["clean"].tolist(), metadatas=make_metadatas(uniq))
+            self._sync_copies(fresh, canon)
+            with self.lock:
+                # otro hilo pudo confirmar los mismos ids mientras etiquetábamos
+                fresh = fresh[~fresh["doc_id"].isin(self.corpus.row_of.keys())]
+                row = self.corpus.append(fresh)
+                self._aggregate(fresh, row)
+
+        with self.lock:
+            rows = live["doc_id"].map(self.corpus.row_of).dropna().astype(int)
+            out = self.corpus.to_frame(rows=rows.tolist())
+        return out.reset_index(drop=True)
+
+    def start_collector(self, queries=None, **kwargs):
+        """Arranca (una vez) el `LiveCollector` en segundo plano."""
+        from src.live_collector import LiveCollector
+
+        if self.collector is None:
+            self.collector = LiveCollector(self, queries, **kwargs).start()
+        return self.collector
 
     def insight_live(self, query: str, n: int = 30) -> str:
-        recent = self.live_search(query, n=n)
-        if not recent.empty:
-            context = "\n".join(recent["clean"].tolist()[:30])
+        return "".join(self.insight_live_stream(query, n=n)).strip()
+
+    def insight_live_stream(self, query: str, n: int = 30):
+        """
+        Resumen de tweets en vivo, en streaming. Si el `LiveCollector` ya
+        tiene resultados de `query` se resumen ésos (ya etiquetados, sin
+        gastar cupo de la API). Si no, se busca en Twitter: la consulta
+        vectorial (respaldo si no devuelve nada) corre en paralelo al
+        fetch, y el etiquetado/embedding/escritura en Chroma de lo
+        descargado sigue en segundo plano mientras el LLM ya está generando.
+        """
+        from src.data_pipeline import clean_series
+        from src.twitter_live import search
+
+        raw = self.collector.results(query).head(n) if self.collector is not None else pd.DataFrame()
+        fallback = None
+        if raw.empty:
+            fallback = self._pool.submit(self.db.query, query, 30)
+            raw = pd.DataFrame(search(query, n=n))
+            if not raw.empty:
+                ingest = self._pool.submit(self.ingest_live, raw)
+                ingest.add_done_callback(
+                    lambda f: f.exception() and log.warning(f"ingesta live fallida: {f.exception()}")
+                )
+        if not raw.empty:
+            docs = [{"document": t} for t in clean_series(raw["text"]).tolist()[:30]]
         else:
-            context = "\n".join(self.db.query(query, k=30))
+            docs = fallback.result()
+        context = "\n".join(h["document"] for h in dedup_hits(docs))
 
         prompt = f"""
 Con base en el contexto, responde a la pregunta.
@@ -170,9 +563,10 @@ Contexto:
 Pregunta: {query}
 """.strip()
 
-        response = openai.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-        return response.choices[0].message.content.strip()
+        yield from self._complete_stream(prompt)
+
+
+def _copies_tag(hit: dict) -> str:
+    # Titular sindicado: cuántas cuentas publicaron el mismo texto
+    n = hit["metadata"].get("copies", 1)
+    return f" (×{n})" if n > 1 else ""
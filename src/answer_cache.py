@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.keyword_index import tokenize
+
+# ── configuración ─────────────────────────────────────────────────
+ANSWER_SIM = float(os.getenv("ANSWER_CACHE_SIM", "0.95"))         # coseno mínimo para un hit
+ANSWER_TTL = float(os.getenv("ANSWER_CACHE_TTL", "900"))          # segundos
+ANSWER_MAX = int(os.getenv("ANSWER_CACHE_SIZE", "256"))           # entradas (LRU)
+CONTEXT_DUP_SIM = float(os.getenv("CONTEXT_DUP_SIM", "0.8"))      # Jaccard de casi-duplicados
+
+
+def _unit(v) -> np.ndarray:
+    v = np.asarray(v, dtype=np.float32).ravel()
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+class AnswerCache:
+    """
+    Caché semántica de respuestas del LLM, en memoria:
+    - la clave es el embedding de la pregunta (+ `scope`: tipo de consulta,
+      k y filtros); un hit es la entrada con coseno ≥ `threshold`;
+    - cada entrada guarda el radio de su contexto (distancia coseno del
+      hit más lejano recuperado); si llega un documento nuevo más cerca de
+      la pregunta que ese radio, habría entrado en el top-k ⇒ se invalida;
+    - evicción por TTL y LRU (`max_entries`).
+    """
+
+    def __init__(self, threshold: float = ANSWER_SIM, ttl: float = ANSWER_TTL, max_entries: int = ANSWER_MAX):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict[int, dict] = OrderedDict()
+        self.hits = self.misses = self.invalidated = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _expire(self, now: float) -> None:
+        dead = [k for k, e in self.entries.items() if now - e["created"] > self.ttl]
+        for k in dead:
+            del self.entries[k]
+
+    # ── API pública ────────────────────────────────────────────────
+    def get(self, embedding, scope: str = "") -> str | None:
+        q = _unit(embedding)
+        with self._lock:
+            self._expire(time.time())
+            best, best_sim = None, self.threshold
+            for k, e in self.entries.items():
+                if e["scope"] != scope:
+                    continue
+                sim = float(e["embedding"] @ q)
+                if sim >= best_sim:
+                    best, best_sim = k, sim
+            if best is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(best)
+            self.hits += 1
+            return self.entries[best]["answer"]
+
+    def put(self, embedding, answer: str, scope: str = "", radius: float = 2.0) -> None:
+        """`radius`: distancia coseno del hit más lejano usado como contexto."""
+        with self._lock:
+            self.entries[self._next] = {
+                "embedding": _unit(embedding),
+                "answer": answer,
+                "scope": scope,
+                "radius": radius,
+                "created": time.time(),
+            }
+            self._next += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate_near(self, ids, embeddings) -> int:
+        """
+        Hook de `VectorDB` tras cada escritura: borra las respuestas cuyo
+        top-k habría cambiado con los documentos nuevos.
+        """
+        with self._lock:
+            if not self.entries or embeddings is None or not len(embeddings):
+                return 0
+            keys = list(self.entries)
+            queries = np.stack([self.entries[k]["embedding"] for k in keys])
+            radius = np.array([self.entries[k]["radius"] for k in keys], dtype=np.float32)
+            docs = np.asarray(embeddings, dtype=np.float32)
+            docs = docs / np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+            if docs.shape[1] != queries.shape[1]:
+                return 0
+            nearest = 1.0 - (docs @ queries.T).max(axis=0)   # distancia del doc nuevo más cercano
+            stale = [k for k, d, r in zip(keys, nearest, radius) if d < r]
+            for k in stale:
+                del self.entries[k]
+            self.invalidated += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        """Vacía la caché y reinicia los contadores."""
+        with self._lock:
+            self.entries.clear()
+            self.hits = self.misses = self.invalidated = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# ── contexto del prompt ───────────────────────────────────────────
+def dedup_hits(hits: list[dict], max_sim: float = CONTEXT_DUP_SIM) -> list[dict]:
+    """
+    Quita del contexto los tweets casi duplicados (Jaccard de palabras
+    ≥ `max_sim` con uno ya elegido), conservando el orden de relevancia.
+    Los titulares repetidos por varias cuentas sólo gastan tokens.
+    """
+    kept, kept_sets = [], []
+    for h in hits:
+        words = set(tokenize(h["document"]))
+        dup = any(
+            len(words & s) >= max_sim * len(words | s) for s in kept_sets if words or s
+        )
+        if not dup:
+            kept.append(h)
+            kept_sets.append(words)
+    return kept
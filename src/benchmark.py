@@ -0,0 +1,733 @@
+"""
+Benchmarks reproducibles sobre `data/tweets_fin_2024.parquet`.
+
+    python -m src.benchmark finbert --n 2000 --workers 2
+    python -m src.benchmark parity --backend int8 --n 2000
+    python -m src.benchmark text --n 200000
+    python -m src.benchmark corpus --n 100000
+    python -m src.benchmark coldstart --runs 5
+    python -m src.benchmark answers --n 5000
+    python -m src.benchmark ttft --first-ms 400 --tokens 80
+    python -m src.benchmark rollups --n 500000
+    python -m src.benchmark topics --n 20000
+    python -m src.benchmark server --sessions 16 --requests 20
+    python -m src.benchmark suite --sizes 10000,100000,1000000 --json base.json
+    python -m src.benchmark suite --compare base.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+DATA_PATH = "data/tweets_fin_2024.parquet"
+
+
+# ── helpers ───────────────────────────────────────────────────────
+def load_texts(n: int, path: str = DATA_PATH) -> list[str]:
+    """Primeros `n` textos limpios del dataset (se repite si hace falta)."""
+    from src.data_pipeline import clean
+
+    texts = pd.read_parquet(path, columns=["text"])["text"].map(clean).tolist()
+    reps = -(-n // len(texts))
+    return (texts * reps)[:n]
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def report(name: str, n: int, seconds: float) -> None:
+    print(f"{name:<28} {n:>9,} tweets  {seconds:8.2f} s  {n / max(seconds, 1e-9):10.1f} tweets/s")
+
+
+# ── FinBERT ───────────────────────────────────────────────────────
+def _fixed_batch_finbert(texts: list[str], batch: int = 16) -> list[str]:
+    """Implementación original: lotes fijos de 16 en orden de llegada."""
+    import torch
+    from src.data_pipeline import id2label, load_finbert
+
+    tokenizer, model = load_finbert()
+    preds: list[int] = []
+    for i in range(0, len(texts), batch):
+        toks = tokenizer(texts[i : i + batch], padding=True, truncation=True, return_tensors="pt")
+        with torch.inference_mode():
+            preds.extend(torch.argmax(model(**toks).logits, dim=1).tolist())
+    return [id2label[p] for p in preds]
+
+
+def bench_finbert(args) -> None:
+    from src.inference import FinBertEngine
+
+    texts = load_texts(args.n)
+    base, t_base = timed(_fixed_batch_finbert, texts)
+    report("finbert (lotes fijos 16)", len(texts), t_base)
+
+    engine = FinBertEngine(
+        token_budget=args.token_budget, workers=args.workers, threads_per_worker=args.threads
+    )
+    engine.predict(texts[:8])  # calienta el pool / los workers
+    fast, t_fast = timed(engine.predict, texts)
+    engine.close()
+    report(f"FinBertEngine (workers={args.workers})", len(texts), t_fast)
+
+    agree = sum(a == b for a, b in zip(base, fast)) / max(len(texts), 1)
+    print(f"speedup x{t_base / max(t_fast, 1e-9):.2f} · concordancia de etiquetas {agree:.4f}")
+
+
+# ── paridad de backends (int8 / onnx vs. torch fp32) ──────────────
+def bench_parity(args) -> None:
+    """Concordancia de etiquetas FinBERT y deriva coseno de Mini-LM."""
+    from src.inference import FinBertEngine
+    from src.vector_db import load_embedder
+
+    texts = load_texts(args.n)
+
+    ref, t_ref = timed(FinBertEngine(backend="torch").predict, texts)
+    alt, t_alt = timed(FinBertEngine(backend=args.backend).predict, texts)
+    report("finbert torch", len(texts), t_ref)
+    report(f"finbert {args.backend}", len(texts), t_alt)
+    agree = sum(a == b for a, b in zip(ref, alt)) / max(len(texts), 1)
+    print(f"FinBERT · concordancia de etiquetas {agree:.4f} · speedup x{t_ref / max(t_alt, 1e-9):.2f}")
+
+    e_ref, t_ref = timed(load_embedder("torch").encode, texts, batch_size=64)
+    e_alt, t_alt = timed(load_embedder(args.backend).encode, texts, batch_size=64)
+    report("minilm torch", len(texts), t_ref)
+    report(f"minilm {args.backend}", len(texts), t_alt)
+    a = np.asarray(e_ref, dtype=np.float32)
+    b = np.asarray(e_alt, dtype=np.float32)
+    cos = (a * b).sum(1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+    print(
+        f"Mini-LM · coseno medio {cos.mean():.5f} · p1 {np.percentile(cos, 1):.5f} "
+        f"· mínimo {cos.min():.5f} · speedup x{t_ref / max(t_alt, 1e-9):.2f}"
+    )
+
+
+# ── limpieza y tickers vectorizados ───────────────────────────────
+def bench_text(args) -> None:
+    """
+    Microbenchmark de clean_series / extract_tickers_series frente a la
+    versión escalar; la paridad exacta se comprueba en tests/test_text.py.
+    """
+    from src.data_pipeline import clean, clean_series, extract_tickers, extract_tickers_series
+
+    raw = pd.read_parquet(DATA_PATH, columns=["text"])["text"].tolist()
+    texts = pd.Series((raw * -(-args.n // len(raw)))[: args.n])
+
+    ref_clean, t_ref = timed(lambda: texts.map(clean).tolist())
+    new_clean, t_new = timed(lambda: clean_series(texts).tolist())
+    report("clean (map)", len(texts), t_ref)
+    report("clean_series", len(texts), t_new)
+    print(f"clean · speedup x{t_ref / max(t_new, 1e-9):.2f}")
+
+    cleaned = pd.Series(ref_clean)
+    ref_tk, t_ref = timed(lambda: cleaned.map(extract_tickers).tolist())
+    new_tk, t_new = timed(lambda: extract_tickers_series(cleaned).tolist())
+    report("extract_tickers (map)", len(texts), t_ref)
+    report("extract_tickers_series", len(texts), t_new)
+    print(f"tickers · speedup x{t_ref / max(t_new, 1e-9):.2f}")
+
+
+# ── memoria: DataFrame con listas vs. Corpus columnar ─────────────
+def synthetic_labelled(n: int, dim: int = 384, seed: int = 0) -> pd.DataFrame:
+    """Lote etiquetado sintético con la forma de la salida de add_labels."""
+    from src.data_pipeline import clean_series, extract_tickers_series, label_map
+
+    rng = np.random.default_rng(seed)
+    base = pd.read_parquet(DATA_PATH)
+    idx = rng.integers(0, len(base), n)
+    df = base.iloc[idx].reset_index(drop=True)
+    df["doc_id"] = df.index.astype(str)
+    df["clean"] = clean_series(df["text"])
+    df["tickers"] = extract_tickers_series(df["clean"])
+    df["sentiment"] = rng.choice(["positive", "neutral", "negative"], n).astype(object)
+    df["topic"] = [label_map[x] for x in df["label"]]
+    if dim:
+        df["embedding"] = list(rng.standard_normal((n, dim), dtype=np.float32).tolist())
+    return df
+
+
+def _frame_bytes(df: pd.DataFrame, sample: int = 2000) -> int:
+    """memory_usage(deep) + contenido de las columnas de listas (muestreado)."""
+    total = int(df.memory_usage(deep=True).sum())
+    for col in ("tickers", "embedding"):
+        if col in df and len(df):
+            rows = df[col].iloc[:sample]
+            inner = sum(sum(sys.getsizeof(x) for x in v) for v in rows)
+            total += int(inner * len(df) / len(rows))
+    return total
+
+
+def bench_corpus(args) -> None:
+    from src.corpus import Corpus
+
+    df = synthetic_labelled(args.n, dim=args.dim)
+    per_m = 1_000_000 / max(len(df), 1) / 2**20
+
+    frame = df.copy()
+    frame["sentiment"] = frame["sentiment"].astype(object)
+    print(f"DataFrame (listas)       {_frame_bytes(frame) * per_m:10,.0f} MiB / millón de tweets")
+
+    corpus = Corpus()
+    for i in range(0, len(df), args.batch):
+        chunk = df.iloc[i : i + args.batch]
+        corpus.append(chunk, embeddings=chunk["embedding"] if args.dim else None)
+    print(f"Corpus columnar float32  {corpus.nbytes() * per_m:10,.0f} MiB / millón de tweets")
+
+    half = Corpus(emb_dtype=np.float16)
+    half.append(df, embeddings=df["embedding"] if args.dim else None)
+    print(f"Corpus columnar float16  {half.nbytes() * per_m:10,.0f} MiB / millón de tweets")
+
+
+# ── arranque en frío: imports y agente listo para el dashboard ───
+_HEAVY = ("torch", "transformers", "sentence_transformers", "chromadb", "openai", "joblib", "sklearn")
+
+_COLDSTART = """
+import json, sys, time
+t0 = time.perf_counter()
+from src.agent import FinancialTweetAgent
+import src.plotting
+t1 = time.perf_counter()
+agent = FinancialTweetAgent(db_path=sys.argv[1])
+agent.pivot(20), agent.mention_counts()
+t2 = time.perf_counter()
+heavy = [m for m in {heavy!r} if m in sys.modules]
+agent.warm_up(background=False)
+t3 = time.perf_counter()
+print(json.dumps({{"import": t1 - t0, "dashboard": t2 - t0, "warm": t3 - t2, "heavy": heavy}}))
+"""
+
+
+def bench_coldstart(args) -> None:
+    """Intérpretes nuevos: tiempo hasta poder pintar el dashboard y precalentado."""
+    code = _COLDSTART.format(heavy=_HEAVY)
+    runs = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", code, args.db],
+            capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    for key, name in (("import", "import src.agent + plotting"), ("dashboard", "dashboard listo"), ("warm", "warm_up (modelos)")):
+        vals = [r[key] for r in runs]
+        print(f"{name:<28} mediana {np.median(vals):6.2f} s · mín {min(vals):6.2f} s · máx {max(vals):6.2f} s")
+    heavy = runs[-1]["heavy"]
+    print(f"módulos pesados cargados antes del dashboard: {', '.join(heavy) or 'ninguno'}")
+
+
+# ── caché semántica de respuestas + contexto sin duplicados ──────
+class StubLLM:
+    """Cliente OpenAI falso: cuenta llamadas y caracteres de prompt."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.calls = 0
+        self.prompt_chars = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **_):
+        from types import SimpleNamespace
+
+        self.calls += 1
+        self.prompt_chars += sum(len(m["content"]) for m in messages)
+        time.sleep(self.latency_s)
+        msg = SimpleNamespace(content=f"respuesta #{self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=msg)])
+
+
+_QUESTIONS = [
+    ("¿Qué se dice de NVIDIA?", "que se dice de NVIDIA", "¿Qué se dice de Nvidia?"),
+    ("¿Cómo reaccionó el mercado a la Fed?", "como reacciono el mercado a la Fed?"),
+    ("Opiniones sobre el petróleo", "opiniones sobre el petróleo."),
+    ("¿Hay noticias de dividendos?", "hay noticias de dividendos"),
+]
+
+
+def bench_answers(args) -> None:
+    """Llamadas al LLM, tokens de prompt y latencia con/sin caché semántica."""
+    from src.agent import FinancialTweetAgent
+    from src.vector_db import make_metadatas
+
+    agent = FinancialTweetAgent(db_path=args.db)
+    if agent.db.collection.count() < args.n:
+        df = synthetic_labelled(args.n, dim=0)
+        df["doc_id"] = "bench:" + df["doc_id"]
+        agent.db.add(df["doc_id"].tolist(), df["clean"].tolist(), metadatas=make_metadatas(df))
+
+    queries = [q for group in _QUESTIONS for q in group] * args.repeat
+    for label, use_cache in (("sin caché", False), ("con caché", True)):
+        agent._client = llm = StubLLM(args.llm_ms / 1000)
+        agent.answers.clear()
+        agent.answers.threshold = args.sim if use_cache else 2.0   # 2.0 ⇒ nunca hay hit
+        lat = []
+        for q in queries:
+            _, s = timed(agent.insight_hist, q, k=args.k)
+            lat.append(s)
+        print(
+            f"{label:<10} {len(queries)} preguntas · {llm.calls} llamadas LLM · "
+            f"{llm.prompt_chars / max(llm.calls, 1):,.0f} car./prompt · "
+            f"p50 {np.percentile(lat, 50) * 1e3:6.1f} ms · p95 {np.percentile(lat, 95) * 1e3:6.1f} ms"
+        )
+    print(f"caché: {agent.answers.stats()}")
+
+    from src.answer_cache import dedup_hits
+
+    hits = agent.db.query(_QUESTIONS[0][0], k=args.k)
+    before = sum(len(h["document"][:280]) for h in hits)
+    kept = dedup_hits(hits)
+    after = sum(len(h["document"][:280]) for h in kept)
+    print(f"contexto: {len(hits)} → {len(kept)} tweets tras quitar casi-duplicados ({before:,} → {after:,} car.)")
+
+    df = synthetic_labelled(1, dim=0)
+    df["doc_id"] = f"bench:new:{time.time_ns()}"
+    df["clean"] = _QUESTIONS[0][0]
+    agent.db.add(df["doc_id"].tolist(), df["clean"].tolist(), metadatas=make_metadatas(df))
+    print(f"tras añadir un tweet junto a la pregunta: {agent.answers.stats()['invalidated']} respuesta(s) invalidada(s)")
+
+
+# ── rollups temporales vs. groupby sobre el corpus ───────────────
+def bench_rollups(args) -> None:
+    """Paridad y latencia de una ventana por ticker: groupby completo vs. Rollups."""
+    from src.rollups import Rollups
+
+    df = synthetic_labelled(args.n, dim=0)
+    rng = np.random.default_rng(1)
+    end = pd.Timestamp("2024-06-30", tz="UTC")
+    df["created_at"] = end - pd.to_timedelta(rng.integers(0, args.days * 86400, len(df)), unit="s")
+
+    rollups = Rollups()
+    _, t_build = timed(
+        lambda: [rollups.update(c["tickers"], c["sentiment"], c["created_at"])
+                 for c in (df.iloc[i : i + 5_000] for i in range(0, len(df), 5_000))]
+    )
+    report("Rollups.update (incremental)", len(df), t_build)
+
+    ticker = df.explode("tickers")["tickers"].value_counts().index[0]
+    since = end - pd.Timedelta(days=args.window)
+
+    def groupby():
+        x = df[df["created_at"] >= since].explode("tickers")
+        x = x[x["tickers"] == ticker]
+        x = x.assign(bucket=x["created_at"].dt.floor("h"))
+        return x.groupby(["bucket", "sentiment"]).size().unstack(fill_value=0)
+
+    ref, t_ref = timed(groupby)
+    new, t_new = timed(rollups.series, ticker, "hour", since)
+    got = new.set_index("bucket")[[c for c in ref.columns]]
+    bad = int((got.reindex(ref.index).fillna(-1).astype(int) != ref).to_numpy().sum())
+    print(f"ventana {args.window} d de {ticker} por hora: groupby {t_ref * 1e3:8.1f} ms · "
+          f"rollups {t_new * 1e3:6.2f} ms · x{t_ref / max(t_new, 1e-9):,.0f} · diferencias {bad}")
+    if bad:
+        raise SystemExit("❌ los rollups no coinciden con el groupby")
+
+
+# ── time-to-first-token contra un endpoint local simulado ────────
+class _MockAPI(BaseHTTPRequestHandler):
+    """
+    OpenAI chat completions (JSON o SSE) y Twitter search/recent falsos,
+    con latencias configurables en `server.cfg`.
+    """
+
+    def log_message(self, *_):
+        pass
+
+    def _json(self, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        cfg = self.server.cfg
+        time.sleep(cfg["twitter_ms"] / 1000)
+        tweets = [
+            {"id": str(10**15 + i), "text": t, "created_at": "2024-05-01T10:00:00.000Z", "lang": "en"}
+            for i, t in enumerate(cfg["tweets"])
+        ]
+        self._json({"data": tweets, "meta": {"result_count": len(tweets)}})
+
+    def do_POST(self):
+        cfg = self.server.cfg
+        req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        words = [f"tok{i} " for i in range(cfg["tokens"])]
+        time.sleep(cfg["first_ms"] / 1000)
+        head = {"id": "mock", "created": 0, "model": req["model"]}
+        if not req.get("stream"):
+            time.sleep(cfg["token_ms"] * len(words) / 1000)
+            msg = {"role": "assistant", "content": "".join(words)}
+            self._json({**head, "object": "chat.completion",
+                        "choices": [{"index": 0, "message": msg, "finish_reason": "stop"}]})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for w in words:
+            chunk = {**head, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": w}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(cfg["token_ms"] / 1000)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def _first_and_total(gen) -> tuple[float, float]:
+    t0 = time.perf_counter()
+    first = None
+    for _ in gen:
+        if first is None:
+            first = time.perf_counter() - t0
+    return first, time.perf_counter() - t0
+
+
+def bench_ttft(args) -> None:
+    """TTFT y latencia total: respuesta completa vs. streaming (hist y live)."""
+    server, url = _mock_server(
+        first_ms=args.first_ms, token_ms=args.token_ms, tokens=args.tokens,
+        twitter_ms=args.twitter_ms, tweets=load_texts(args.live_n),
+    )
+
+    import openai
+    from src.agent import FinancialTweetAgent
+    from src.vector_db import make_metadatas
+
+    agent = FinancialTweetAgent(db_path=args.db, client=openai.OpenAI(base_url=f"{url}/v1", api_key="mock"))
+    if agent.db.collection.count() < args.n:
+        df = synthetic_labelled(args.n, dim=0)
+        df["doc_id"] = "bench:" + df["doc_id"]
+        agent.db.add(df["doc_id"].tolist(), df["clean"].tolist(), metadatas=make_metadatas(df))
+    agent.answers.threshold = 2.0   # sin caché: se mide siempre la llamada al LLM
+    agent.insight_hist("calentamiento")
+
+    def whole(fn):
+        def gen(q):
+            yield fn(q)
+        return gen
+
+    rows = [
+        ("hist completo", whole(agent.insight_hist)),
+        ("hist streaming", agent.insight_hist_stream),
+        ("live completo (antes)", whole(lambda q: _live_blocking(agent, q))),
+        ("live streaming", agent.insight_live_stream),
+    ]
+    for name, fn in rows:
+        firsts, totals = [], []
+        for i in range(args.runs):
+            first, total = _first_and_total(fn(f"¿Qué se dice de NVIDIA? #{i}"))
+            firsts.append(first)
+            totals.append(total)
+        print(f"{name:<22} TTFT p50 {np.median(firsts) * 1e3:7.0f} ms · total p50 {np.median(totals) * 1e3:7.0f} ms")
+    server.shutdown()
+
+
+def _live_blocking(agent, query: str) -> str:
+    """Flujo original de insight_live: fetch → etiquetar/embeber/escribir → LLM."""
+    recent = agent.live_search(query, n=30)
+    context = "\n".join(recent["clean"].tolist()[:30]) if not recent.empty else ""
+    return agent._complete(f"Contexto:\n{context}\n\nPregunta: {query}")
+
+
+# ── temas: en serie vs. en paralelo con FinBERT y cacheados ─────
+def bench_topics(args) -> None:
+    """FinBERT + clasificador de temas: en serie (original), en paralelo y con caché."""
+    from src.data_pipeline import _topic_name, finbert_sentiment, get_topic_clf, predict_topics
+
+    clf = get_topic_clf()
+    if clf is None:
+        raise SystemExit("❌ no existe src/topic_clf.joblib")
+    texts = load_texts(args.n)
+    model_texts = texts[: args.model_n]
+    finbert_sentiment(model_texts[:32], use_cache=False)   # calienta FinBERT
+
+    def serial():
+        finbert_sentiment(model_texts, use_cache=False)
+        return clf.predict(texts)
+
+    def parallel():
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            topics = pool.submit(predict_topics, texts, use_cache=False)
+            finbert_sentiment(model_texts, use_cache=False)
+            return topics.result()
+
+    ref, t_ref = timed(serial)
+    new, t_new = timed(parallel)
+    report("FinBERT + temas en serie", len(texts), t_ref)
+    report("FinBERT ‖ temas en lotes", len(texts), t_new)
+
+    _, t_cold = timed(predict_topics, texts)
+    _, t_warm = timed(predict_topics, texts)
+    report("temas (caché fría)", len(texts), t_cold)
+    report("temas (caché caliente)", len(texts), t_warm)
+
+    bad = sum(_topic_name(a) != b for a, b in zip(ref, new))
+    print(f"temas · {len(set(new))} distintos · diferencias {bad} · ejemplo {new[0]!r} (antes {ref[0]!r})")
+    if bad:
+        raise SystemExit("❌ los temas por lotes no coinciden con predict()")
+
+
+# ── servicio de modelos: sesiones concurrentes con micro-batching ─
+def bench_server(args) -> None:
+    """Sesiones concurrentes pidiendo sentimiento: cada una por su cuenta vs. `ModelServer`."""
+    from src.data_pipeline import finbert_sentiment
+    from src.metrics import metrics
+    from src.model_server import ModelClient, ModelServer
+
+    texts = load_texts(args.sessions * args.requests * args.per_request)
+    finbert_sentiment(texts[:32], use_cache=False)   # calienta FinBERT
+
+    def run(label: str, call) -> None:
+        lat, lock = [], threading.Lock()
+
+        def session(s):
+            for r in range(args.requests):
+                i = (s * args.requests + r) * args.per_request
+                # sufijo único: sin aciertos de caché, se mide el modelo
+                batch = [f"{t} #{s}.{r}" for t in texts[i : i + args.per_request]]
+                _, secs = timed(call, batch)
+                with lock:
+                    lat.append(secs)
+
+        threads = [threading.Thread(target=session, args=(s,)) for s in range(args.sessions)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        print(f"{label:<22} {len(lat) / wall:8.1f} pet/s · p50 {np.percentile(lat, 50) * 1e3:7.1f} ms · "
+              f"p95 {np.percentile(lat, 95) * 1e3:7.1f} ms")
+
+    run("por sesión", lambda b: finbert_sentiment(b, use_cache=False))
+
+    server = ModelServer(args.db, port=0, window_ms=args.window_ms).start()
+    client = ModelClient(server.url)
+    metrics.reset()
+    run(f"servidor ({args.window_ms:g} ms)", client.sentiment)
+    s = metrics.snapshot()["stages"].get("batch_sentiment", {"calls": 0, "items": 0})
+    print(f"lotes de FinBERT: {s['calls']} · {s['items'] / max(s['calls'], 1):.1f} textos/lote "
+          f"(vs. {args.per_request} por petición)")
+    server.shutdown()
+
+
+# ── suite por etapas: throughput, percentiles y memoria pico ─────
+def _mock_server(**cfg) -> tuple[ThreadingHTTPServer, str]:
+    """`_MockAPI` en un puerto libre; apunta Twitter al mock (antes de importar src.twitter_live)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockAPI)
+    server.cfg = cfg
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    os.environ["TWITTER_API_URL"] = f"{url}/2"
+    os.environ.setdefault("TWITTER_BEARER", "mock")
+    return server, url
+
+
+def _chunks(df: pd.DataFrame, size: int):
+    return (df.iloc[i : i + size] for i in range(0, len(df), size))
+
+
+def _run_stage(name: str, fn, memory: bool) -> dict:
+    """
+    Ejecuta `fn(tag)` y lee la etapa `name` del registro de métricas.
+    Con `memory`, una segunda pasada bajo tracemalloc mide el pico de
+    memoria Python (los tensores de torch/onnx no cuentan); se separa
+    de la pasada cronometrada porque tracemalloc la ralentiza.
+    """
+    from src.metrics import metrics
+
+    metrics.reset()
+    fn("t")
+    row = metrics.snapshot()["stages"].get(name, {"calls": 0, "items": 0, "items_per_s": 0.0,
+                                                  "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0})
+    row = {"stage": name, **row, "peak_mib": None}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn("m")
+            row["peak_mib"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        finally:
+            tracemalloc.stop()
+    return row
+
+
+def bench_suite(args) -> None:
+    """Cada etapa del pipeline a varios tamaños sintéticos, con OpenAI y Twitter simulados."""
+    server, url = _mock_server(
+        first_ms=args.llm_ms, token_ms=1, tokens=40, twitter_ms=args.twitter_ms, tweets=load_texts(30),
+    )
+    import openai
+    from src.agent import FinancialTweetAgent
+    from src.data_pipeline import clean_series, extract_tickers_series, finbert_sentiment, predict_topics
+
+    queries = [q for group in _QUESTIONS for q in group]
+    results = []
+    for n in args.sizes:
+        df = synthetic_labelled(n, dim=0)
+        model_df = df.iloc[: args.model_n]   # etapas limitadas por el modelo: coste lineal, se acota
+        tmp = tempfile.mkdtemp(prefix="fta_suite_")
+        agents = {}
+
+        def agent(tag):
+            if tag not in agents:
+                llm = openai.OpenAI(base_url=f"{url}/v1", api_key="mock")
+                agents[tag] = a = FinancialTweetAgent(db_path=f"{tmp}/{tag}", client=llm)
+                a.answers.threshold = 2.0   # sin caché: siempre se mide la llamada
+                a.corpus.append(df)
+                a._aggregate(df, 0)
+            return agents[tag]
+
+        stages = [
+            ("clean", lambda tag: [clean_series(c["text"]) for c in _chunks(df, args.batch)]),
+            ("extract_tickers", lambda tag: [extract_tickers_series(c["clean"]) for c in _chunks(df, args.batch)]),
+            ("finbert", lambda tag: [finbert_sentiment(c["clean"].tolist(), use_cache=False)
+                                     for c in _chunks(model_df, args.batch)]),
+            ("topic", lambda tag: [predict_topics(c["clean"].tolist(), use_cache=False) for c in _chunks(df, args.batch)]),
+            ("vector_add", lambda tag: [agent(tag).db.add((f"{tag}:" + c["doc_id"]).tolist(), c["clean"].tolist())
+                                        for c in _chunks(model_df, args.batch)]),
+            ("vector_query", lambda tag: [agent(tag).db.query(q, 30) for q in queries * args.repeat]),
+            ("pivot", lambda tag: [agent(tag).pivot(20) for _ in range(args.repeat * 10)]),
+            ("llm", lambda tag: [agent(tag).insight_hist(q) for q in queries[: args.repeat * 3]]),
+            ("twitter_request", lambda tag: [agent(tag).live_search(q) for q in queries[: args.repeat]]),
+        ]
+        for name, fn in stages:
+            row = {"n": n, **_run_stage(name, fn, not args.no_memory)}
+            results.append(row)
+            peak = "" if row["peak_mib"] is None else f"{row['peak_mib']:9.1f} MiB"
+            print(
+                f"{n:>9,} {name:<16} {row['calls']:>6} llamadas · {row['items_per_s']:12,.1f} elem/s · "
+                f"p50 {row['p50_ms']:9.2f} · p95 {row['p95_ms']:9.2f} · p99 {row['p99_ms']:9.2f} ms {peak}",
+                flush=True,
+            )
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=1)
+        print(f"resultados en {args.json}")
+    if args.compare:
+        _compare(results, args.compare, args.tolerance)
+
+
+def _compare(results: list[dict], path: str, tolerance: float) -> None:
+    """Falla si alguna etapa pierde más de `tolerance` de throughput o sube su p95 otro tanto."""
+    with open(path) as fh:
+        base = {(r["n"], r["stage"]): r for r in json.load(fh)}
+    bad = []
+    for r in results:
+        b = base.get((r["n"], r["stage"]))
+        if not b or not b["calls"]:
+            continue
+        slower = r["items_per_s"] < b["items_per_s"] * (1 - tolerance)
+        later = r["p95_ms"] > b["p95_ms"] * (1 + tolerance)
+        if slower or later:
+            bad.append(f"{r['stage']} (n={r['n']:,}): {b['items_per_s']:,.1f} → {r['items_per_s']:,.1f} elem/s, "
+                       f"p95 {b['p95_ms']:.2f} → {r['p95_ms']:.2f} ms")
+    if bad:
+        raise SystemExit("❌ regresiones frente a " + path + ":\n  " + "\n  ".join(bad))
+    print(f"✅ sin regresiones frente a {path} (tolerancia {tolerance:.0%})")
+
+
+# ── CLI ───────────────────────────────────────────────────────────
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("finbert", help="FinBertEngine vs. implementación original")
+    p.add_argument("--n", type=int, default=2000)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--threads", type=int, default=None)
+    p.add_argument("--token-budget", type=int, default=8192)
+    p.set_defaults(fn=bench_finbert)
+
+    p = sub.add_parser("parity", help="precisión y velocidad de int8/onnx frente a torch")
+    p.add_argument("--backend", choices=["int8", "onnx"], default="int8")
+    p.add_argument("--n", type=int, default=2000)
+    p.set_defaults(fn=bench_parity)
+
+    p = sub.add_parser("text", help="paridad y velocidad de la limpieza vectorizada")
+    p.add_argument("--n", type=int, default=200_000)
+    p.set_defaults(fn=bench_text)
+
+    p = sub.add_parser("corpus", help="memoria por millón de tweets: DataFrame vs. Corpus")
+    p.add_argument("--n", type=int, default=100_000)
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--batch", type=int, default=5_000)
+    p.set_defaults(fn=bench_corpus)
+
+    p = sub.add_parser("coldstart", help="tiempo de import y arranque del agente en frío")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--db", default="chroma_db")
+    p.set_defaults(fn=bench_coldstart)
+
+    p = sub.add_parser("answers", help="caché semántica de respuestas con un LLM simulado")
+    p.add_argument("--n", type=int, default=5_000, help="documentos sintéticos en la colección")
+    p.add_argument("--db", default="bench_db")
+    p.add_argument("--k", type=int, default=30)
+    p.add_argument("--sim", type=float, default=0.95)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--llm-ms", type=float, default=800, help="latencia simulada del LLM")
+    p.set_defaults(fn=bench_answers)
+
+    p = sub.add_parser("ttft", help="time-to-first-token con un endpoint OpenAI/Twitter local")
+    p.add_argument("--n", type=int, default=2_000, help="documentos sintéticos en la colección")
+    p.add_argument("--db", default="bench_db")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--first-ms", type=float, default=400, help="latencia hasta el primer token")
+    p.add_argument("--token-ms", type=float, default=15)
+    p.add_argument("--tokens", type=int, default=80)
+    p.add_argument("--twitter-ms", type=float, default=300)
+    p.add_argument("--live-n", type=int, default=30)
+    p.set_defaults(fn=bench_ttft)
+
+    p = sub.add_parser("rollups", help="series temporales: rollups vs. groupby")
+    p.add_argument("--n", type=int, default=500_000)
+    p.add_argument("--days", type=int, default=180)
+    p.add_argument("--window", type=int, default=7)
+    p.set_defaults(fn=bench_rollups)
+
+    p = sub.add_parser("topics", help="temas en lotes, en paralelo con FinBERT y cacheados")
+    p.add_argument("--n", type=int, default=20_000)
+    p.add_argument("--model-n", type=int, default=2_000, help="tweets para FinBERT")
+    p.set_defaults(fn=bench_topics)
+
+    p = sub.add_parser("server", help="sesiones concurrentes: modelos por sesión vs. ModelServer")
+    p.add_argument("--sessions", type=int, default=16)
+    p.add_argument("--requests", type=int, default=20, help="peticiones por sesión")
+    p.add_argument("--per-request", type=int, default=4, help="textos por petición")
+    p.add_argument("--window-ms", type=float, default=10)
+    p.add_argument("--db", default="bench_db")
+    p.set_defaults(fn=bench_server)
+
+    p = sub.add_parser("suite", help="throughput, percentiles y memoria pico por etapa del pipeline")
+    p.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10_000, 100_000],
+                   help="tamaños sintéticos separados por comas (remuestreo del dataset)")
+    p.add_argument("--model-n", type=int, default=2_000, help="máximo de tweets para FinBERT y VectorDB.add")
+    p.add_argument("--batch", type=int, default=5_000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--llm-ms", type=float, default=300, help="latencia simulada del LLM")
+    p.add_argument("--twitter-ms", type=float, default=100)
+    p.add_argument("--no-memory", action="store_true", help="omite la pasada con tracemalloc")
+    p.add_argument("--json", default=None, help="guarda los resultados (línea base)")
+    p.add_argument("--compare", default=None, help="línea base JSON contra la que comparar")
+    p.add_argument("--tolerance", type=float, default=0.2)
+    p.set_defaults(fn=bench_suite)
+
+    args = parser.parse_args(argv)
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
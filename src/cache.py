@@ -0,0 +1,197 @@
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# ── configuración ─────────────────────────────────────────────────
+CACHE_PATH = os.getenv("MODEL_CACHE_PATH", "chroma_db/model_cache.sqlite")
+CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+_SQL_CHUNK = 500  # límite prudente de parámetros por sentencia SQLite
+
+
+class ModelCache:
+    """
+    Caché persistente (SQLite) de salidas de modelos direccionada por
+    contenido: la clave es un hash del texto limpio + nombre/versión del
+    modelo. Evicción LRU por tamaño total y contadores de hits/misses.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " size INTEGER NOT NULL, atime REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_atime ON cache(atime)")
+        self._bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()[0]
+
+    # ── helpers internos ────────────────────────────────────────────
+    @staticmethod
+    def key(text: str, namespace: str) -> str:
+        return hashlib.blake2b(
+            f"{namespace}\x00{text}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    def _evict(self) -> None:
+        """Borra las entradas menos usadas hasta quedar al 90 % del límite."""
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM cache ORDER BY atime LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._bytes = 0
+                break
+            freed, victims = 0, []
+            for k, size in rows:
+                victims.append((k,))
+                freed += size
+                if self._bytes - freed <= target:
+                    break
+            self._conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+            self._bytes -= freed
+
+    # ── API pública ────────────────────────────────────────────────
+    def get_many(self, keys) -> dict[str, bytes]:
+        keys = list(keys)
+        found: dict[str, bytes] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[i : i + _SQL_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                found.update(
+                    self._conn.execute(
+                        f"SELECT key, value FROM cache WHERE key IN ({marks})", chunk
+                    ).fetchall()
+                )
+            if found:
+                self._conn.executemany(
+                    "UPDATE cache SET atime = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: dict[str, bytes]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, size, atime) VALUES (?, ?, ?, ?)",
+                [(k, v, len(v), now) for k, v in items.items()],
+            )
+            self._bytes += sum(len(v) for v in items.values())
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def record(self, hits: int, misses: int) -> None:
+        """Suma a los contadores; `cached_apply` se llama desde varios hilos a la vez."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            hits, misses, size = self.hits, self.misses, self._bytes
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self._bytes = 0
+
+
+_cache: ModelCache | None = None
+
+
+def get_cache() -> ModelCache:
+    """Instancia compartida del proceso (se crea al primer uso)."""
+    global _cache
+    if _cache is None:
+        _cache = ModelCache()
+    return _cache
+
+
+def load_once(fn):
+    """
+    `lru_cache` para cargadores de modelos, seguro entre hilos: si el hilo
+    de precalentamiento y la UI piden el mismo modelo a la vez, se carga
+    una sola vez y el segundo espera al primero.
+    """
+    cached = functools.lru_cache(maxsize=None)(fn)
+    lock = threading.RLock()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return cached(*args, **kwargs)
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+@load_once
+def _shared(cls, path: str):
+    return cls(path)
+
+
+def shared(cls, path):
+    """
+    Instancia única de `cls(path)` por ruta en el proceso (como `get_cache`):
+    los estados persistentes junto a `chroma_db` — checkpoint, watermarks,
+    índice de casi-duplicados — no deben tener una copia por sesión de
+    Streamlit que se pisen al escribir.
+    """
+    return _shared(cls, str(Path(path).resolve()))
+
+
+def cached_apply(fn, texts: list[str], namespace: str, *, encode, decode, cache=None) -> list:
+    """
+    Aplica `fn` (lista de textos → lista de salidas) consultando antes la
+    caché. Sólo los textos únicos ausentes pasan por el modelo; los
+    duplicados dentro del mismo lote se calculan una sola vez.
+    """
+    cache = cache or get_cache()
+    keys = [cache.key(t, namespace) for t in texts]
+    found = cache.get_many(set(keys))
+
+    missing: dict[str, str] = {}
+    for k, t in zip(keys, texts):
+        if k not in found and k not in missing:
+            missing[k] = t
+
+    if missing:
+        outputs = fn(list(missing.values()))
+        fresh = {k: encode(o) for k, o in zip(missing, outputs)}
+        cache.put_many(fresh)
+        found.update(fresh)
+
+    cache.record(hits=len(texts) - len(missing), misses=len(missing))
+    return [decode(found[k]) for k in keys]
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+
+def read_json(path: Path) -> dict:
+    """Contenido de un estado JSON; {} si no existe o está corrupto."""
+    path = Path(path)
+    if path.exists():
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def write_json_atomic(path: Path, data) -> None:
+    """Escribe `data` como JSON vía archivo temporal + `os.replace`: nunca queda a medias."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=1))
+    os.replace(tmp, path)
+
+
+class IngestCheckpoint:
+    """
+    Registro persistente (JSON junto a `chroma_db`) de cuántas filas de cada
+    archivo ya se confirmaron en la base vectorial. Permite reanudar una
+    ingesta por lotes desde el último lote confirmado si el proceso muere.
+    Las sesiones lo comparten con `shared(IngestCheckpoint, ruta)`; cada
+    escritura parte del archivo en disco y sólo cambia su propia clave,
+    así que otro proceso sobre el mismo `chroma_db` no pierde su progreso.
+    """
+
+    def __init__(self, path: str = "chroma_db/ingest_state.json"):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.state: dict[str, dict] = read_json(self.path)
+
+    # ── helpers internos ────────────────────────────────────────────
+    @staticmethod
+    def key(source) -> str:
+        """Identifica un archivo por nombre + tamaño (+ mtime si es ruta)."""
+        if isinstance(source, (str, os.PathLike)):
+            st = os.stat(source)
+            return f"{Path(source).resolve()}:{st.st_size}:{int(st.st_mtime)}"
+        # file-like (p. ej. UploadedFile de Streamlit)
+        name = getattr(source, "name", "upload")
+        size = getattr(source, "size", None)
+        if size is None and hasattr(source, "seek"):
+            pos = source.tell()
+            size = source.seek(0, os.SEEK_END)
+            source.seek(pos)
+        return f"{name}:{size}"
+
+    def _flush(self, key: str) -> None:
+        self.state = {**read_json(self.path), key: self.state[key]}
+        write_json_atomic(self.path, self.state)
+
+    # ── API pública ────────────────────────────────────────────────
+    def rows_done(self, key: str) -> int:
+        with self._lock:
+            self.state = read_json(self.path)    # progreso de otro proceso sobre el mismo chroma_db
+        entry = self.state.get(key)
+        if not entry or entry.get("finished"):
+            return 0
+        return int(entry.get("rows", 0))
+
+    def commit(self, key: str, rows: int, total: int) -> None:
+        with self._lock:
+            self.state[key] = {"rows": rows, "total": total, "finished": False}
+            self._flush(key)
+
+    def finish(self, key: str) -> None:
+        with self._lock:
+            if key in self.state:
+                self.state[key]["finished"] = True
+                self._flush(key)
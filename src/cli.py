@@ -0,0 +1,157 @@
+"""
+Ingesta offline (sin Streamlit) de uno o varios Parquet a ChromaDB, y
+servicio de modelos compartido entre sesiones.
+
+    python -m src.cli ingest data/tweets_fin_2024.parquet
+    python -m src.cli ingest data/ otros/*.parquet --workers 4 --batch-size 10000
+    python -m src.cli ingest data/ --no-resume --db /tmp/chroma_db
+    python -m src.cli ingest data/ --metrics ingest.prom
+    python -m src.cli serve --db chroma_db --port 8765
+
+Cada archivo pasa por `add_labels` + `VectorDB.add` lote a lote; el progreso
+se confirma en `ingest_state.json`, así que un trabajo interrumpido continúa
+donde se quedó al relanzarlo. Sólo se escribe en Chroma (`keep_in_memory=False`):
+la memoria no crece con el número de filas salvo el índice de casi-duplicados
+(firma + texto por canónico). Los archivos se procesan uno tras otro;
+`--workers` reparte cada lote de FinBERT entre procesos.
+"""
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+
+
+# ── helpers ───────────────────────────────────────────────────────
+def expand_paths(paths) -> list[Path]:
+    """Archivos .parquet de `paths` (los directorios se recorren recursivamente)."""
+    files: list[Path] = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            files.extend(sorted(p.rglob("*.parquet")))
+        elif p.exists():
+            files.append(p)
+        else:
+            raise SystemExit(f"❌ No existe: {p}")
+    return list(dict.fromkeys(files))
+
+
+def _configure(args) -> None:
+    # Los módulos del pipeline leen su configuración del entorno al importarse
+    if args.workers:
+        os.environ["FINBERT_WORKERS"] = str(args.workers)
+    if args.threads:
+        os.environ["FINBERT_THREADS"] = str(args.threads)
+    if args.backend:
+        os.environ["INFERENCE_BACKEND"] = args.backend
+
+
+# ── comandos ──────────────────────────────────────────────────────
+def cmd_ingest(args) -> None:
+    _configure(args)
+    from src.agent import FinancialTweetAgent
+
+    files = expand_paths(args.paths)
+    if not files:
+        raise SystemExit("❌ No se encontraron archivos .parquet")
+
+    agent = FinancialTweetAgent(db_path=args.db)
+    rows = new = 0
+    t0 = time.perf_counter()
+    for f in files:
+        last = [0.0]
+
+        def progress(done, total, f=f, last=last):
+            now = time.perf_counter()
+            if now - last[0] >= args.log_every or done == total:
+                last[0] = now
+                print(f"  {f.name}: {done:,}/{total:,} filas", flush=True)
+
+        summary = agent.ingest(
+            str(f),
+            batch_size=args.batch_size,
+            progress=progress,
+            resume=not args.no_resume,
+            id_prefix=None if args.id_prefix else "",   # None: `<archivo>:<fila>`, como la app
+            keep_in_memory=False,   # sin corpus ni agregados: memoria acotada
+        )
+        rows += summary["rows"]
+        new += summary["new"]
+        print(
+            f"✅ {f}: {summary['rows']:,} filas · {summary['new']:,} nuevas · "
+            f"{summary['seconds']:.1f} s · {summary['docs_per_s']:,.0f} docs/s"
+            + (f" (reanudado tras {summary['skipped_rows']:,})" if summary["skipped_rows"] else ""),
+            flush=True,
+        )
+
+    secs = time.perf_counter() - t0
+    print(
+        f"Total: {len(files)} archivo(s) · {rows:,} filas · {new:,} documentos nuevos · "
+        f"{secs:.1f} s · {rows / max(secs, 1e-9):,.0f} docs/s"
+    )
+    if args.metrics:
+        from src.metrics import metrics
+
+        for name, s in metrics.snapshot()["stages"].items():
+            print(f"  {name:<16} {s['items']:>10,} · {s['seconds']:8.2f} s · p95 {s['p95_ms']:9.1f} ms/llamada")
+        metrics.write(args.metrics)
+        print(f"Métricas (Prometheus) en {args.metrics}")
+
+
+def cmd_serve(args) -> None:
+    _configure(args)
+    from src.model_server import ModelServer
+
+    opts = {"port": args.port, "window_ms": args.window_ms, "max_items": args.max_batch}
+    server = ModelServer(args.db, args.host, **{k: v for k, v in opts.items() if v is not None})
+    print("Cargando modelos…", flush=True)
+    server.warm_up()
+    print(f"✅ Sirviendo {args.db} en {server.url} (MODEL_SERVER_URL={server.url})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+# ── CLI ───────────────────────────────────────────────────────────
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("ingest", help="etiqueta, embebe y guarda archivos .parquet en ChromaDB")
+    p.add_argument("paths", nargs="+", help="archivos .parquet o directorios")
+    p.add_argument("--db", default="chroma_db", help="directorio de ChromaDB")
+    p.add_argument("--batch-size", type=int, default=5_000)
+    p.add_argument(
+        "--workers", type=int, default=None,
+        help="procesos FinBERT (FINBERT_WORKERS) para cada lote; los archivos se procesan de uno en uno",
+    )
+    p.add_argument("--threads", type=int, default=None, help="hilos torch por proceso (FINBERT_THREADS)")
+    p.add_argument("--backend", choices=["torch", "int8", "onnx"], default=None)
+    p.add_argument("--no-resume", action="store_true", help="ignora el checkpoint y empieza de cero")
+    p.add_argument(
+        "--id-prefix", dest="id_prefix", action=argparse.BooleanOptionalAction, default=True,
+        help="doc_id = <archivo>:<fila> si el parquet no trae doc_id (--no-id-prefix: sólo la fila)",
+    )
+    p.add_argument("--log-every", type=float, default=5.0, help="segundos entre líneas de progreso")
+    p.add_argument("--metrics", default=None, metavar="PATH", help="escribe tiempos por etapa en formato Prometheus")
+    p.set_defaults(fn=cmd_ingest)
+
+    p = sub.add_parser("serve", help="sirve FinBERT, Mini-LM, temas y Chroma a varias sesiones")
+    p.add_argument("--db", default="chroma_db", help="directorio de ChromaDB")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=None, help="por defecto MODEL_SERVER_PORT (8765)")
+    p.add_argument("--window-ms", type=float, default=None, help="ventana de micro-batching (BATCH_WINDOW_MS)")
+    p.add_argument("--max-batch", type=int, default=None, help="elementos por lote (BATCH_MAX)")
+    p.add_argument("--workers", type=int, default=None, help="procesos FinBERT (FINBERT_WORKERS)")
+    p.add_argument("--threads", type=int, default=None, help="hilos torch por proceso (FINBERT_THREADS)")
+    p.add_argument("--backend", choices=["torch", "int8", "onnx"], default=None)
+    p.set_defaults(fn=cmd_serve)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
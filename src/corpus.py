@@ -0,0 +1,220 @@
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+# ── bloques de construcción ───────────────────────────────────────
+class _Vocab:
+    """Diccionario str ↔ código entero (para categorías y tickers)."""
+
+    def __init__(self, values=()):
+        self.values: list[str] = []
+        self.codes: dict[str, int] = {}
+        for v in values:
+            self.code(v)
+
+    def code(self, value: str) -> int:
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+
+class _GrowArray:
+    """Array numpy con capacidad que se duplica: append amortizado O(1)."""
+
+    def __init__(self, dtype, width: int | None = None, capacity: int = 1024):
+        shape = (capacity,) if width is None else (capacity, width)
+        self.data = np.empty(shape, dtype=dtype)
+        self.n = 0
+
+    def extend(self, values) -> None:
+        values = np.asarray(values, dtype=self.data.dtype)
+        need = self.n + len(values)
+        if need > len(self.data):
+            cap = max(need, 2 * len(self.data))
+            grown = np.empty((cap, *self.data.shape[1:]), dtype=self.data.dtype)
+            grown[: self.n] = self.data[: self.n]
+            self.data = grown
+        self.data[self.n : need] = values
+        self.n = need
+
+    def view(self) -> np.ndarray:
+        return self.data[: self.n]
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+
+class _StrColumn:
+    """Columna de texto como trozos de pyarrow (offsets + bytes UTF-8)."""
+
+    def __init__(self):
+        self.chunks: list[pa.Array] = []
+        self.starts: list[int] = []
+        self.n = 0
+
+    def extend(self, values) -> None:
+        arr = pa.array(values, type=pa.string(), from_pandas=True)
+        if len(arr):
+            self.chunks.append(arr)
+            self.starts.append(self.n)
+            self.n += len(arr)
+
+    def get(self, i: int) -> str:
+        c = bisect_right(self.starts, i) - 1
+        return self.chunks[c][i - self.starts[c]].as_py()
+
+    def take(self, rows) -> list[str]:
+        return [self.get(i) for i in rows]
+
+    def to_numpy(self) -> np.ndarray:
+        if not self.chunks:
+            return np.empty(0, dtype=object)
+        return pa.chunked_array(self.chunks).to_numpy()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.chunks)
+
+
+# ── corpus ────────────────────────────────────────────────────────
+class Corpus:
+    """
+    Corpus en memoria columnar y compacto, sustituto del DataFrame que
+    crecía a base de `pd.concat`:
+    - `sentiment` y `topic` como códigos int8/int16 + vocabulario;
+    - `tickers` codificados por diccionario (offsets + valores int32);
+    - embeddings en una única matriz contigua float32 (o float16);
+    - textos como arrays de pyarrow; `append` amortizado sin copias totales.
+    `to_frame()` materializa las vistas DataFrame que necesita el dashboard.
+    """
+
+    SENTIMENTS = ("positive", "neutral", "negative")
+
+    def __init__(self, emb_dtype=np.float32):
+        self.emb_dtype = emb_dtype
+        self.doc_id = _StrColumn()
+        self.text = _StrColumn()
+        self.clean = _StrColumn()
+        self.sentiments = _Vocab(self.SENTIMENTS)
+        self.topics = _Vocab()
+        self.ticker_vocab = _Vocab()
+        self._sentiment = _GrowArray(np.int8)
+        self._topic = _GrowArray(np.int16)
+        self._created_at = _GrowArray("datetime64[ns]")
+        self._tk_offsets = _GrowArray(np.int64)
+        self._tk_offsets.extend([0])
+        self._tk_values = _GrowArray(np.int32)
+        self._emb: _GrowArray | None = None
+        self._has_emb = _GrowArray(np.bool_)
+        self.row_of: dict[str, int] = {}
+        self.version = 0
+
+    def __len__(self) -> int:
+        return self.doc_id.n
+
+    # ── escritura ──────────────────────────────────────────────────
+    def append(self, df: pd.DataFrame, embeddings=None) -> int:
+        """
+        Añade un lote etiquetado (doc_id, text, clean, sentiment, topic,
+        tickers y opcionalmente created_at). Devuelve la fila inicial.
+        """
+        start = len(self)
+        n = len(df)
+        if not n:
+            return start
+
+        self.doc_id.extend(df["doc_id"].astype(str))
+        self.text.extend(df["text"] if "text" in df else df["clean"])
+        self.clean.extend(df["clean"])
+        self._sentiment.extend([self.sentiments.code(s) for s in df["sentiment"]])
+        topics = df["topic"] if "topic" in df else ["Unknown"] * n
+        self._topic.extend([self.topics.code(t) for t in topics])
+        if "created_at" in df:
+            created = pd.to_datetime(df["created_at"], utc=True, errors="coerce")
+            self._created_at.extend(created.dt.tz_localize(None).to_numpy("datetime64[ns]"))
+        else:
+            self._created_at.extend(np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]"))
+
+        lengths, values = [], []
+        for tks in df["tickers"]:
+            lengths.append(len(tks))
+            values.extend(self.ticker_vocab.code(t) for t in tks)
+        self._tk_values.extend(values)
+        self._tk_offsets.extend(self._tk_offsets.view()[-1] + np.cumsum(lengths))
+
+        if embeddings is not None:
+            emb = np.asarray(list(embeddings), dtype=self.emb_dtype)
+            if self._emb is None:
+                self._emb = _GrowArray(self.emb_dtype, width=emb.shape[1])
+                self._emb.extend(np.zeros((start, emb.shape[1])))
+            self._emb.extend(emb)
+            self._has_emb.extend(np.ones(n, dtype=bool))
+        else:
+            if self._emb is not None:
+                self._emb.extend(np.zeros((n, self._emb.data.shape[1])))
+            self._has_emb.extend(np.zeros(n, dtype=bool))
+
+        for i, d in enumerate(self.doc_id.chunks[-1].to_pylist(), start=start):
+            self.row_of[d] = i
+        self.version += 1
+        return start
+
+    # ── lectura ────────────────────────────────────────────────────
+    def tickers_at(self, i: int) -> list[str]:
+        off = self._tk_offsets.view()
+        vocab = self.ticker_vocab.values
+        return [vocab[c] for c in self._tk_values.view()[off[i] : off[i + 1]]]
+
+    def sentiment_at(self, i: int) -> str:
+        return self.sentiments.values[self._sentiment.view()[i]]
+
+    def topic_at(self, i: int) -> str:
+        return self.topics.values[self._topic.view()[i]]
+
+    def sentiment_codes(self) -> np.ndarray:
+        return self._sentiment.view()
+
+    def embeddings(self) -> np.ndarray | None:
+        """Matriz (n, dim) de embeddings; filas sin embedding quedan en cero."""
+        return None if self._emb is None else self._emb.view()
+
+    def to_frame(self, rows=None) -> pd.DataFrame:
+        """Vista DataFrame (sin embeddings) del corpus completo o de `rows`."""
+        if rows is None:
+            idx = np.arange(len(self))
+            doc_id, text, clean = self.doc_id.to_numpy(), self.text.to_numpy(), self.clean.to_numpy()
+        else:
+            idx = np.asarray(rows, dtype=np.int64)
+            doc_id, text, clean = self.doc_id.take(idx), self.text.take(idx), self.clean.take(idx)
+
+        return pd.DataFrame(
+            {
+                "doc_id": doc_id,
+                "text": text,
+                "clean": clean,
+                "sentiment": pd.Categorical.from_codes(
+                    self._sentiment.view()[idx], categories=self.sentiments.values
+                ),
+                "topic": pd.Categorical.from_codes(
+                    self._topic.view()[idx], categories=self.topics.values
+                ),
+                "tickers": [self.tickers_at(i) for i in idx],
+                "created_at": self._created_at.view()[idx],
+            },
+            index=idx,
+        )
+
+    def nbytes(self) -> int:
+        """Memoria aproximada de los datos (sin contar el dict doc_id → fila)."""
+        parts = [
+            self.doc_id, self.text, self.clean, self._sentiment, self._topic,
+            self._created_at, self._tk_offsets, self._tk_values, self._has_emb,
+        ]
+        total = sum(p.nbytes for p in parts)
+        return total + (self._emb.nbytes if self._emb is not None else 0)
@@ -1,13 +1,23 @@
+import os
 import re
 import emoji
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import torch
-import joblib
-import streamlit as st
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.cache import cached_apply, load_once
+from src.metrics import metrics
 
 # ── tablas de mapeo ───────────────────────────────────────────────
+FINBERT_MODEL = os.getenv("FINBERT_MODEL", "ProsusAI/finbert")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")   # torch | int8 | onnx
+FINBERT_CACHE_NS = f"{FINBERT_MODEL}:{INFERENCE_BACKEND}:v1"   # subir la versión si cambia el modelo
+TOPIC_BATCH = int(os.getenv("TOPIC_BATCH", "4096"))           # textos por llamada al clasificador
+
 id2label = {0: "negative", 1: "neutral", 2: "positive"}
 
 label_map = [
@@ -17,15 +27,48 @@ label_map = [
     "Stock Movement", "Tech", "Trade", "USD"
 ]
 
-# ── carga de clasificador de temas ────────────────────────────────
+# ── carga perezosa de modelos ─────────────────────────────────────
+# joblib/sklearn y transformers/torch sólo se importan al primer uso, para
+# que abrir el dashboard no pague segundos de imports que no necesita.
 topic_path = Path(__file__).with_name("topic_clf.joblib")
-topic_clf = joblib.load(topic_path) if topic_path.exists() else None
 
-# ── FinBERT cacheado ──────────────────────────────────────────────
-@st.cache_resource
+
+@load_once
+def get_topic_clf():
+    """Clasificador de temas (o None si no hay joblib), cargado una vez."""
+    if not topic_path.exists():
+        return None
+    import joblib
+
+    return joblib.load(topic_path)
+
+
+def _topic_cache_ns() -> str:
+    # re-entrenar el joblib (otro tamaño o mtime) invalida la caché
+    st = topic_path.stat()
+    return f"topic:{st.st_size}:{int(st.st_mtime)}:v1"
+
+
+def topic_uses_vectors(clf) -> bool:
+    """True si el clasificador espera embeddings en vez de texto (no trae vectorizador propio)."""
+    first = clf.steps[0][1] if hasattr(clf, "steps") else clf
+    return not hasattr(first, "build_analyzer")
+
+
+def __getattr__(name):
+    # compatibilidad: `data_pipeline.topic_clf` sigue funcionando, en diferido
+    if name == "topic_clf":
+        return get_topic_clf()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ── FinBERT cacheado (una vez por proceso) ────────────────────────
+@load_once
 def load_finbert():
-    tok = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-    mdl = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tok = AutoTokenizer.from_pretrained(FINBERT_MODEL)
+    mdl = AutoModelForSequenceClassification.from_pretrained(FINBERT_MODEL)
     mdl.eval()
     return tok, mdl
 
@@ -35,22 +78,62 @@ def clean(text: str) -> str:
     text = re.sub(r"http\S+|@\w+|#\w+", "", text)
     return re.sub(r"\s+", " ", text).strip()
 
-def finbert_sentiment(texts: list[str], batch: int = 16) -> list[str]:
+@metrics.timed("finbert", items=lambda texts, *a, **k: len(texts))
+def finbert_sentiment(texts: list[str], engine=None, use_cache: bool = True) -> list[str]:
     """
     Devuelve ['positive'|'neutral'|'negative'] usando SIEMPRE CPU.
     Evita cualquier riesgo de CUDA illegal memory access.
+    La inferencia la hace `FinBertEngine` (lotes por longitud en tokens,
+    pool de procesos opcional); con `use_cache=True` sólo los textos nunca
+    vistos pasan por el modelo.
     """
-    tokenizer, model = load_finbert()   # el modelo está en CPU por defecto
-    preds: list[int] = []
+    from src.inference import get_engine
+
+    engine = engine or get_engine()
+    if not use_cache:
+        return engine.predict(texts)
+    return cached_apply(engine.predict, texts, FINBERT_CACHE_NS, encode=str.encode, decode=bytes.decode)
+
 
-    for i in range(0, len(texts), batch):
-        chunk = texts[i : i + batch]
-        toks = tokenizer(chunk, padding=True, truncation=True, return_tensors="pt")  # tensors en CPU
-        with torch.inference_mode():
-            logits = model(**toks).logits          # forward en CPU
-        preds.extend(torch.argmax(logits, dim=1).tolist())
+def _topic_name(pred) -> str:
+    # el joblib del repo predice el índice del tema; otros modelos, el nombre
+    if isinstance(pred, str):
+        return pred
+    try:
+        i = int(pred)
+    except (TypeError, ValueError):
+        return "Unknown"
+    return label_map[i] if 0 <= i < len(label_map) and i == pred else "Unknown"
 
-    return [id2label[p] for p in preds]
+
+@metrics.timed("topic", items=lambda texts, *a, **k: len(texts))
+def predict_topics(texts: list[str], embed=None, use_cache: bool = True) -> list[str]:
+    """
+    Tema de cada texto con `topic_clf.joblib`, en lotes de `TOPIC_BATCH` y
+    consultando antes la caché por hash del texto. Si el clasificador
+    trabaja sobre embeddings, `embed` (p. ej. `VectorDB.embed`) los
+    obtiene de la caché del vector store: un solo pase del encoder sirve
+    para el tema y para Chroma.
+    """
+    clf = get_topic_clf()
+    if clf is None:
+        return ["Unknown"] * len(texts)
+    if topic_uses_vectors(clf) and embed is None:
+        from src.vector_db import load_embedder
+
+        embed = load_embedder().encode
+
+    def run(todo: list[str]) -> list[str]:
+        out = []
+        for i in range(0, len(todo), TOPIC_BATCH):
+            batch = todo[i : i + TOPIC_BATCH]
+            X = np.asarray(embed(batch), dtype=np.float32) if topic_uses_vectors(clf) else batch
+            out.extend(_topic_name(p) for p in clf.predict(X))
+        return out
+
+    if not use_cache:
+        return run(list(texts))
+    return cached_apply(run, texts, _topic_cache_ns(), encode=str.encode, decode=bytes.decode)
 
 
 COMMON_WORDS = {
@@ -64,35 +147,138 @@ def extract_tickers(text: str) -> list[str]:
     return [t for t in tickers if t not in COMMON_WORDS]
 
 
+# ── versiones vectorizadas (columnas completas) ──────────────────
+# Mismo resultado que clean() / extract_tickers(), pero por columna:
+# - las filas ASCII (la mayoría) se limpian con kernels regex de pyarrow;
+#   en ASCII no hay emojis, y las clases de espacio se escriben explícitas
+#   porque \s de RE2 no incluye \v ni \x1c-\x1f como sí hace `re`;
+# - el resto usa `re` precompilado y sólo las filas con algún carácter de
+#   la tabla de emojis pagan emoji.replace_emoji.
+_NOISE_RE = re.compile(r"http\S+|@\w+|#\w+")
+_TICKER_RE = re.compile(r"\$?([A-Z]{2,5})\b")
+_EMOJI_CHARS = frozenset(
+    {c for e in emoji.EMOJI_DATA for c in e if not c.isascii()}
+    | {"\ufe0e", "\ufe0f"}   # replace_emoji descarta siempre los selectores de variante
+)
+_ASCII_WS = r"\t\n\x0b\x0c\r\x1c-\x1f "
+_ARROW_NOISE = rf"http[^{_ASCII_WS}]+|@\w+|#\w+"
+_ARROW_SPACE = rf"[{_ASCII_WS}]+"
+
+
+def _clean_unicode(text: str) -> str:
+    if not _EMOJI_CHARS.isdisjoint(text):
+        text = emoji.replace_emoji(text, replace="")
+    # split()/join equivale a re.sub(r"\s+", " ").strip() (mismo isspace)
+    return " ".join(_NOISE_RE.sub("", text).split())
+
+
+@metrics.timed("clean", items=lambda texts: len(texts))
+def clean_series(texts: pd.Series) -> pd.Series:
+    """`texts.map(clean)` por columna; idéntico resultado."""
+    arr = pa.array(texts, type=pa.string(), from_pandas=True)
+    ascii_mask = pc.fill_null(pc.string_is_ascii(arr), True).to_numpy(zero_copy_only=False)
+
+    fast = arr.filter(ascii_mask)
+    fast = pc.replace_substring_regex(fast, _ARROW_NOISE, "")
+    fast = pc.replace_substring_regex(fast, _ARROW_SPACE, " ")
+    fast = pc.replace_substring_regex(fast, "^ | $", "")
+
+    out = np.empty(len(arr), dtype=object)
+    out[ascii_mask] = fast.to_numpy(zero_copy_only=False)
+    out[~ascii_mask] = [_clean_unicode(t) for t in arr.filter(~ascii_mask).to_pylist()]
+    return pd.Series(out, index=texts.index, dtype=object)
+
+
+@metrics.timed("extract_tickers", items=lambda texts: len(texts))
+def extract_tickers_series(texts: pd.Series) -> pd.Series:
+    """`texts.map(extract_tickers)` con un solo patrón precompilado."""
+    findall, stop = _TICKER_RE.findall, COMMON_WORDS
+    out = []
+    for x in texts.tolist():
+        found = findall(x)
+        # sólo se filtra si aparece alguna stop-word (caso poco frecuente)
+        out.append(found if stop.isdisjoint(found) else [t for t in found if t not in stop])
+    return pd.Series(out, index=texts.index, dtype=object)
+
+
+# ── lectura por lotes ────────────────────────────────────────────
+def parquet_num_rows(source) -> int:
+    """Número de filas según los metadatos del Parquet (sin leer datos)."""
+    return pq.ParquetFile(source).metadata.num_rows
+
+
+def iter_parquet_batches(source, batch_size: int = 5_000, start_row: int = 0):
+    """
+    Recorre un Parquet en lotes de `batch_size` filas usando record batches
+    de pyarrow, sin materializar el archivo completo. Los row groups que
+    terminan antes de `start_row` se saltan sin leerse (reanudación).
+    Cada lote es un DataFrame cuyo índice es la posición global de la fila.
+    """
+    pf = pq.ParquetFile(source)
+    meta = pf.metadata
+
+    groups, offset, pos = [], 0, 0
+    for g in range(meta.num_row_groups):
+        pos += meta.row_group(g).num_rows
+        if pos > start_row:
+            groups.append(g)
+        else:
+            offset = pos
+    if not groups:
+        return
+
+    skip = start_row - offset
+    for batch in pf.iter_batches(batch_size=batch_size, row_groups=groups):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            offset += batch.num_rows
+            continue
+        if skip:
+            batch = batch.slice(skip)
+            offset += skip
+            skip = 0
+        df = batch.to_pandas()
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        yield df
+
+
 # ── pipeline principal ───────────────────────────────────────────
-def add_labels(df: pd.DataFrame, *, skip_if_present: bool = True) -> pd.DataFrame:
+def add_labels(
+    df: pd.DataFrame, *, skip_if_present: bool = True, embed=None, engine=None, topics=None
+) -> pd.DataFrame:
     """
     Añade columnas clean, sentiment, tickers y topic solo si faltan.
     Si `skip_if_present=True`, respeta las columnas ya calculadas.
+    El tema se predice en un hilo aparte mientras FinBERT ocupa la CPU;
+    `embed` se pasa a `predict_topics`. `engine` (motor de FinBERT) y
+    `topics` (en lugar de `predict_topics`) permiten etiquetar con otro
+    proceso, p. ej. `ModelClient`.
     """
     df = df.copy()
 
     # Clean
     if "clean" not in df:
-        df["clean"] = df["text"].map(clean)
-
-    # Sentiment
-    if "sentiment" not in df:
-        df["sentiment"] = finbert_sentiment(df["clean"].tolist())
-
-    # Tickers
-    if "tickers" not in df or not skip_if_present:
-        df["tickers"] = df["clean"].map(extract_tickers)
-
-    # Topic
-    if "topic" not in df:
-        if "label" in df:
-            df["topic"] = df["label"].map(
-                lambda x: label_map[x] if 0 <= x < len(label_map) else "Unknown"
-            )
-        elif topic_clf:
-            df["topic"] = topic_clf.predict(df["clean"])
-        else:
-            df["topic"] = "Unknown"
+        df["clean"] = clean_series(df["text"])
+
+    # Topic (en paralelo con FinBERT)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = None
+        if "topic" not in df:
+            if "label" in df:
+                df["topic"] = df["label"].map(_topic_name)
+            else:
+                pending = pool.submit(topics or predict_topics, df["clean"].tolist(), embed)
+
+        # Sentiment
+        if "sentiment" not in df:
+            df["sentiment"] = finbert_sentiment(df["clean"].tolist(), engine=engine)
+
+        # Tickers
+        if "tickers" not in df or not skip_if_present:
+            df["tickers"] = extract_tickers_series(df["clean"])
+
+        if pending is not None:
+            df["topic"] = pending.result()
 
     return df
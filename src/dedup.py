@@ -0,0 +1,248 @@
+import hashlib
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from src.corpus import _GrowArray
+from src.data_pipeline import extract_tickers
+from src.keyword_index import tokenize
+
+# ── configuración ─────────────────────────────────────────────────
+DEDUP_JACCARD = float(os.getenv("DEDUP_JACCARD", "0.95"))  # Jaccard exacto mínimo para colapsar
+NUM_PERM = 32
+BANDS, ROWS = 8, 4            # umbral LSH ≈ (1/8)^(1/4) ≈ 0.59; P(candidato | J=0.95) ≈ 1
+
+# Palabras que cambian el sentido de un titular ("rise" / "fall", "two" /
+# "no cuts"): si sólo una de las dos versiones las trae, no se colapsan.
+# Cualquier token con dígitos cuenta igual (cifras, porcentajes, fechas).
+POLARITY_TOKENS = frozenset("""
+no not never without none nor cannot isn t
+up down rise rises rising rose risen fall falls falling fell fallen
+gain gains gained lose loses losing lost loss losses beat beats missed miss misses
+surge surges surged plunge plunges plunged jump jumps jumped drop drops dropped
+climb climbs climbed slump slumps slumped soar soars soared sink sinks sank
+tumble tumbles tumbled rally rallies rallied slide slides slid
+higher lower high low above below increase increases increased decrease decreases decreased
+raise raises raised cut cuts hike hikes hiked upgrade upgrades upgraded downgrade downgrades downgraded
+buy sell bullish bearish positive negative profit profits strong weak stronger weaker record worst best
+zero one two three four five six seven eight nine ten
+""".split())
+
+# Permutaciones fijas (las firmas se persisten): hashing multiply-shift,
+# (a·h + b) mod 2^64 >> 32, con `a` impar
+_rng = np.random.default_rng(20240501)
+_A = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+_TOKEN_HASHES: dict[str, int] = {}
+
+
+def _token_hash(token: str) -> int:
+    h = _TOKEN_HASHES.get(token)
+    if h is None:
+        if len(_TOKEN_HASHES) > 500_000:
+            _TOKEN_HASHES.clear()
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        h = _TOKEN_HASHES[token] = int.from_bytes(digest, "little")
+    return h
+
+
+def minhash(text: str) -> np.ndarray:
+    """Firma MinHash (NUM_PERM × uint32) del conjunto de palabras de `text`."""
+    tokens = set(tokenize(text))
+    if not tokens:
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    h = np.fromiter((_token_hash(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+    perm = (h[:, None] * _A + _B) >> np.uint64(32)      # (tokens, NUM_PERM), desborda a propósito
+    return perm.min(axis=0).astype(np.uint32)
+
+
+def _changes_meaning(a: frozenset, b: frozenset) -> bool:
+    return any(t in POLARITY_TOKENS or any(c.isdigit() for c in t) for t in a ^ b)
+
+
+def same_story(a: frozenset, b: frozenset, threshold: float = DEDUP_JACCARD) -> bool:
+    """Jaccard exacto de palabras ≥ `threshold` y ninguna palabra de polaridad distinta."""
+    if not a and not b:
+        return True
+    return len(a & b) >= threshold * len(a | b) and not _changes_meaning(a, b)
+
+
+class NearDupIndex:
+    """
+    Índice MinHash-LSH persistente de documentos canónicos:
+    - `assign(ids, texts)` asigna cada texto a un canónico ya visto si es
+      la misma noticia (`same_story`: Jaccard exacto ≥ `threshold` sobre
+      las palabras, sin palabras de polaridad distintas) y menciona los
+      mismos tickers — el canónico es el único que llega a Chroma con sus
+      `t_<TICKER>`, así que una copia con otros tickers sería invisible
+      para el filtro `tickers=` —, o lo registra como canónico nuevo.
+      MinHash-LSH sólo propone candidatos;
+    - lleva el número de copias (canónico incluido) por grupo;
+    - persiste en archivos append-only junto a `chroma_db` (firmas, ids de
+      canónicos, su texto y pares copia → canónico), igual que `IdSet`.
+    """
+
+    def __init__(self, path: str = "chroma_db/near_dups", threshold: float = DEDUP_JACCARD):
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.ids: list[str] = []
+        self.pos: dict[str, int] = {}              # canónico → fila en `sigs` / `texts`
+        self.sigs = _GrowArray(np.uint32, width=NUM_PERM)
+        # texto normalizado del canónico ("" en un índice antiguo sin textos);
+        # palabras y tickers se recalculan sólo para los candidatos de LSH,
+        # así el índice ocupa ~texto + firma por canónico
+        self.texts: list[str] = []
+        self.bands: list[dict[bytes, list[int]]] = [defaultdict(list) for _ in range(BANDS)]
+        self.copies: dict[str, int] = {}
+        self.canon_of: dict[str, str] = {}        # doc_id (copia) → canónico
+        self._lock = threading.Lock()
+        self._load()
+
+    # ── persistencia ───────────────────────────────────────────────
+    @property
+    def _sig_file(self) -> Path:
+        return self.dir / "signatures.bin"
+
+    @property
+    def _id_file(self) -> Path:
+        return self.dir / "canonical_ids.txt"
+
+    @property
+    def _text_file(self) -> Path:
+        return self.dir / "canonical_texts.txt"
+
+    @property
+    def _copies_file(self) -> Path:
+        return self.dir / "copies.txt"
+
+    def _load(self) -> None:
+        if not self._id_file.exists():
+            return
+        ids = self._id_file.read_text().splitlines()
+        sigs = np.fromfile(self._sig_file, dtype=np.uint32).reshape(-1, NUM_PERM)
+        texts = self._text_file.read_text().splitlines() if self._text_file.exists() else []
+        n = min(len(ids), len(sigs))          # tolera una escritura a medias
+        if len(ids) != n or len(sigs) != n or len(texts) != n:
+            # se realinean los tres archivos para que los siguientes appends
+            # no se desfasen; una línea vacía (índice anterior sin textos)
+            # no se puede verificar y ese canónico no absorbe copias
+            ids, sigs, texts = ids[:n], sigs[:n], (texts + [""] * n)[:n]
+            sigs.tofile(self._sig_file)
+            self._text_file.write_text("".join(f"{t}\n" for t in texts))
+            self._id_file.write_text("".join(f"{i}\n" for i in ids))
+        self.ids = ids
+        self.pos = {d: i for i, d in enumerate(ids)}
+        self.sigs.extend(sigs[:n])
+        self.texts = texts
+        for i, sig in enumerate(self.sigs.view()):
+            self._index(i, sig)
+        self.copies = {d: 1 for d in self.ids}
+        if self._copies_file.exists():
+            for line in self._copies_file.read_text().splitlines():
+                doc_id, canon = line.split("\t")
+                if canon in self.copies and doc_id not in self.canon_of:
+                    self.canon_of[doc_id] = canon
+                    self.copies[canon] += 1
+
+    def _index(self, i: int, sig: np.ndarray) -> None:
+        for b in range(BANDS):
+            self.bands[b][sig[b * ROWS : (b + 1) * ROWS].tobytes()].append(i)
+
+    # ── API pública ────────────────────────────────────────────────
+    def assign(self, ids, texts) -> list[str]:
+        """
+        Devuelve, para cada documento, el doc_id de su canónico (el propio
+        si es nuevo). Los duplicados dentro del mismo lote también se
+        agrupan. Un doc_id ya visto se resuelve a su canónico anterior sólo
+        si el texto sigue siendo esa noticia; si no (doc_id posicional
+        reutilizado por otro archivo) se busca su canónico como a uno nuevo,
+        sin registrarlo: el id ya pertenece a otro documento.
+        """
+        out: list[str] = []
+        new_ids, new_sigs, new_texts, new_copies = [], [], [], []
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                doc_id = str(doc_id)
+                words = frozenset(tokenize(text))
+                tickers = frozenset(extract_tickers(text))
+                sig = minhash(text)
+                if doc_id in self:
+                    known = self.canon_of.get(doc_id, doc_id)
+                    if self._same_as(known, sig, words, tickers):
+                        out.append(known)
+                    else:
+                        out.append(self._match(sig, words, tickers) or doc_id)
+                    continue
+                canon = self._match(sig, words, tickers)
+                if canon is None:
+                    i = len(self.ids)
+                    self.pos[doc_id] = i
+                    self.ids.append(doc_id)
+                    self.sigs.extend(sig[None])
+                    self.texts.append(" ".join(text.split()))
+                    self._index(i, sig)
+                    self.copies[doc_id] = 1
+                    new_ids.append(doc_id)
+                    new_sigs.append(sig)
+                    new_texts.append(self.texts[-1])
+                    canon = doc_id
+                else:
+                    self.copies[canon] += 1
+                    self.canon_of[doc_id] = canon
+                    new_copies.append((doc_id, canon))
+                out.append(canon)
+            self._append(new_ids, new_sigs, new_texts, new_copies)
+        return out
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self.copies or doc_id in self.canon_of
+
+    def _same_as(self, canon: str, sig: np.ndarray, words: frozenset, tickers: frozenset) -> bool:
+        """¿El texto (firma, palabras, tickers) es el registrado para el grupo `canon`?"""
+        i = self.pos[canon]
+        other = self.texts[i]
+        if not other:                        # índice antiguo sin texto: sólo la firma
+            return bool(np.array_equal(self.sigs.view()[i], sig))
+        if frozenset(extract_tickers(other)) != tickers:
+            return False
+        return np.array_equal(self.sigs.view()[i], sig) or same_story(words, frozenset(tokenize(other)), self.threshold)
+
+    def _match(self, sig: np.ndarray, words: frozenset, tickers: frozenset) -> str | None:
+        cands = set()
+        for b in range(BANDS):
+            hit = self.bands[b].get(sig[b * ROWS : (b + 1) * ROWS].tobytes())
+            if hit:
+                cands.update(hit)
+        if not cands:
+            return None
+        # candidatos del más al menos parecido según MinHash; decide el Jaccard exacto
+        cands = np.fromiter(cands, dtype=np.int64)
+        sim = (self.sigs.view()[cands] == sig).mean(axis=1)
+        for j in np.argsort(-sim, kind="stable"):
+            i = cands[j]
+            other = self.texts[i]
+            if not other or frozenset(extract_tickers(other)) != tickers:
+                continue
+            if same_story(words, frozenset(tokenize(other)), self.threshold):
+                return self.ids[i]
+        return None
+
+    def _append(self, new_ids, new_sigs, new_texts, new_copies) -> None:
+        if new_ids:
+            with self._sig_file.open("ab") as fh:
+                np.asarray(new_sigs, dtype=np.uint32).tofile(fh)
+            with self._text_file.open("a") as fh:
+                fh.writelines(f"{t}\n" for t in new_texts)
+            with self._id_file.open("a") as fh:
+                fh.writelines(f"{i}\n" for i in new_ids)
+        if new_copies:
+            with self._copies_file.open("a") as fh:
+                fh.writelines(f"{d}\t{c}\n" for d, c in new_copies)
+
+    def stats(self) -> dict:
+        docs = sum(self.copies.values())
+        return {"canonical": len(self.ids), "docs": docs, "collapsed": docs - len(self.ids)}
@@ -0,0 +1,253 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import multiprocessing as mp
+
+import numpy as np
+
+from src.cache import load_once
+from src.data_pipeline import FINBERT_MODEL, INFERENCE_BACKEND, id2label, load_finbert
+
+# ── configuración (variables de entorno) ──────────────────────────
+TOKEN_BUDGET = int(os.getenv("FINBERT_TOKEN_BUDGET", "8192"))  # tokens por lote (filas × long. máx.)
+MAX_BATCH = int(os.getenv("FINBERT_MAX_BATCH", "128"))
+WORKERS = int(os.getenv("FINBERT_WORKERS", "1"))
+THREADS_PER_WORKER = int(os.getenv("FINBERT_THREADS", "0")) or None
+MAX_LENGTH = 512
+
+BACKENDS = ("torch", "int8", "onnx")
+ONNX_DIR = Path(os.getenv("ONNX_DIR", "onnx_models"))
+
+
+# ── backends: torch | int8 (cuantización dinámica) | onnx ─────────
+def check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido {backend!r}; usa uno de {', '.join(BACKENDS)}.")
+
+
+def quantize_int8(model):
+    """Cuantización dinámica int8 de las capas Linear (sólo CPU)."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _optimum():
+    try:
+        from optimum import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            "El backend 'onnx' requiere `pip install optimum[onnxruntime]`."
+        ) from e
+    return onnxruntime
+
+
+def _onnx_model(cls, model_id: str):
+    """Carga el grafo ONNX desde `ONNX_DIR`; lo exporta la primera vez."""
+    local = ONNX_DIR / model_id.replace("/", "__")
+    if local.exists():
+        return cls.from_pretrained(local)
+    model = cls.from_pretrained(model_id, export=True)
+    model.save_pretrained(local)
+    return model
+
+
+def _load_finbert_model(backend: str):
+    """Carga FinBERT para `backend` sin pasar por la caché de Streamlit."""
+    from transformers import AutoModelForSequenceClassification
+
+    check_backend(backend)
+    if backend == "onnx":
+        return _onnx_model(_optimum().ORTModelForSequenceClassification, FINBERT_MODEL)
+    model = AutoModelForSequenceClassification.from_pretrained(FINBERT_MODEL)
+    model.eval()
+    return quantize_int8(model) if backend == "int8" else model
+
+
+@load_once
+def finbert_tokenizer():
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(FINBERT_MODEL)
+
+
+@load_once
+def finbert_model(backend: str = INFERENCE_BACKEND):
+    """Modelo FinBERT del proceso para `backend` (torch reutiliza `load_finbert`)."""
+    if backend == "torch":
+        return load_finbert()[1]
+    return _load_finbert_model(backend)
+
+
+class OnnxEmbedder:
+    """
+    Mini-LM exportado a ONNX con la misma salida que SentenceTransformer
+    (mean pooling + normalización L2). Expone `encode` compatible.
+    """
+
+    def __init__(self, model_id: str, max_length: int = 256):
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.model = _onnx_model(_optimum().ORTModelForFeatureExtraction, model_id)
+        self.max_length = max_length
+
+    def encode(self, texts, batch_size: int = 64, **_) -> np.ndarray:
+        import torch
+
+        out = []
+        for i in range(0, len(texts), batch_size):
+            toks = self.tokenizer(
+                list(texts[i : i + batch_size]),
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt",
+            )
+            with torch.inference_mode():
+                hidden = self.model(**toks).last_hidden_state
+            mask = toks["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            emb = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            out.append(torch.nn.functional.normalize(emb, dim=1).numpy())
+        return np.vstack(out) if out else np.zeros((0, 0), dtype=np.float32)
+
+
+# ── worker de proceso ─────────────────────────────────────────────
+_worker_model = None
+
+
+def _init_worker(threads: int | None, backend: str) -> None:
+    """Inicializa cada proceso: fija hilos intra-op y carga FinBERT una vez."""
+    global _worker_model
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    _worker_model = _load_finbert_model(backend)
+
+
+def _forward(model, input_ids: np.ndarray, attention_mask: np.ndarray) -> list[int]:
+    import torch
+
+    with torch.inference_mode():
+        logits = model(
+            input_ids=torch.from_numpy(input_ids),
+            attention_mask=torch.from_numpy(attention_mask),
+        ).logits
+    return torch.argmax(logits, dim=1).tolist()
+
+
+def _worker_forward(input_ids: np.ndarray, attention_mask: np.ndarray) -> list[int]:
+    return _forward(_worker_model, input_ids, attention_mask)
+
+
+# ── motor ─────────────────────────────────────────────────────────
+class FinBertEngine:
+    """
+    Inferencia FinBERT en CPU optimizada para tweets:
+    - ordena los textos por longitud en tokens (buckets) para minimizar padding;
+    - arma lotes dinámicos que respetan un presupuesto de tokens;
+    - opcionalmente reparte los lotes en un pool de procesos con hilos
+      intra-op fijos por worker;
+    - devuelve las etiquetas en el orden original.
+    `backend` elige torch (fp32), int8 (cuantización dinámica) u onnx.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = TOKEN_BUDGET,
+        max_batch: int = MAX_BATCH,
+        workers: int = WORKERS,
+        threads_per_worker: int | None = THREADS_PER_WORKER,
+        backend: str = INFERENCE_BACKEND,
+    ):
+        check_backend(backend)
+        self.backend = backend
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self._pool = None
+
+    # ── helpers internos ────────────────────────────────────────────
+    def _batches(self, lengths: list[int]):
+        """Índices ordenados por longitud agrupados según el presupuesto."""
+        order = np.argsort(lengths, kind="stable")
+        batch: list[int] = []
+        for idx in order:
+            width = lengths[idx]  # orden ascendente → el último es el más largo
+            if batch and (
+                (len(batch) + 1) * width > self.token_budget
+                or len(batch) >= self.max_batch
+            ):
+                yield batch
+                batch = []
+            batch.append(int(idx))
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _pad(ids: list[list[int]], pad_id: int) -> tuple[np.ndarray, np.ndarray]:
+        width = max(len(x) for x in ids)
+        input_ids = np.full((len(ids), width), pad_id, dtype=np.int64)
+        mask = np.zeros((len(ids), width), dtype=np.int64)
+        for r, x in enumerate(ids):
+            input_ids[r, : len(x)] = x
+            mask[r, : len(x)] = 1
+        return input_ids, mask
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn evita heredar el estado de OpenMP/torch del proceso padre
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.threads_per_worker, self.backend),
+            )
+        return self._pool
+
+    # ── API pública ────────────────────────────────────────────────
+    def predict(self, texts: list[str]) -> list[str]:
+        if not texts:
+            return []
+        tokenizer = finbert_tokenizer()
+        encoded = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)["input_ids"]
+        pad_id = tokenizer.pad_token_id or 0
+
+        batches = list(self._batches([len(x) for x in encoded]))
+        padded = [self._pad([encoded[i] for i in b], pad_id) for b in batches]
+
+        if self.workers > 1:
+            pool = self._get_pool()
+            results = pool.map(_worker_forward, *zip(*padded))
+        else:
+            if self.threads_per_worker:
+                import torch
+
+                torch.set_num_threads(self.threads_per_worker)
+            model = finbert_model(self.backend)
+            results = (_forward(model, ids, mask) for ids, mask in padded)
+
+        preds = [0] * len(texts)
+        for b, labels in zip(batches, results):
+            for i, p in zip(b, labels):
+                preds[i] = p
+        return [id2label[p] for p in preds]
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+_engine: FinBertEngine | None = None
+
+
+def get_engine() -> FinBertEngine:
+    """Motor compartido del proceso, configurado por variables de entorno."""
+    global _engine
+    if _engine is None:
+        _engine = FinBertEngine()
+    return _engine
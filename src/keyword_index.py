@@ -0,0 +1,91 @@
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from operator import itemgetter
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Minúsculas y tokens alfanuméricos (`$NVDA` → `nvda`)."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class KeywordIndex:
+    """
+    Índice invertido BM25 en memoria sobre los documentos de la colección.
+    Complementa la búsqueda vectorial en el modo híbrido de `VectorDB.query`.
+    Hay uno por `chroma_db` en el proceso; `sync` lo pone al día con lo que
+    hayan escrito otras sesiones, el colector o la CLI.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, max_df: float = 0.25):
+        self.k1, self.b = k1, b
+        self.max_df = max_df          # términos en > 25 % de los docs no aportan
+        self.postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self.doc_ids: list[str] = []
+        self.lengths: list[int] = []
+        self.total_len = 0
+        self.known: set[str] = set()
+        self.synced = 0               # filas de la colección ya leídas (en orden de inserción)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, ids, texts) -> None:
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self.known:
+                    continue
+                self.known.add(doc_id)
+                d = len(self.doc_ids)
+                toks = tokenize(text)
+                self.doc_ids.append(doc_id)
+                self.lengths.append(len(toks))
+                self.total_len += len(toks)
+                tf: dict[str, int] = {}
+                for t in toks:
+                    tf[t] = tf.get(t, 0) + 1
+                for t, c in tf.items():
+                    self.postings[t][d] = c
+
+    def sync(self, collection, page: int = 10_000) -> None:
+        """
+        Lee de `collection` sólo las filas añadidas desde la última vez:
+        Chroma devuelve `get` en orden de inserción, así que basta con
+        seguir desde `synced`. Una consulta sin escrituras nuevas cuesta un
+        `count()`.
+        """
+        with self._sync_lock:
+            total = collection.count()
+            while self.synced < total:
+                got = collection.get(include=["documents"], limit=page, offset=self.synced)
+                if not got["ids"]:
+                    break
+                self.add(got["ids"], got["documents"])
+                self.synced += len(got["ids"])
+
+    def search(self, query: str, n: int = 100) -> list[tuple[str, float]]:
+        """Top-`n` (doc_id, score BM25) para `query`."""
+        with self._lock:
+            N = len(self.doc_ids)
+            if not N:
+                return []
+            avgdl = self.total_len / N
+            k1, b = self.k1, self.b
+            scores: dict[int, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                post = self.postings.get(term)
+                if not post or (N > 1000 and len(post) > self.max_df * N):
+                    continue
+                df = len(post)
+                idf = math.log(1 + (N - df + 0.5) / (df + 0.5))
+                for d, tf in post.items():
+                    norm = tf + k1 * (1 - b + b * self.lengths[d] / avgdl)
+                    scores[d] += idf * tf * (k1 + 1) / norm
+            top = heapq.nlargest(n, scores.items(), key=itemgetter(1))
+            return [(self.doc_ids[d], s) for d, s in top]
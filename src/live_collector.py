@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+
+from src.cache import shared
+from src.checkpoint import read_json, write_json_atomic
+from src.twitter_live import chunked_queries, handles, live_query, search_since
+
+log = logging.getLogger(__name__)
+
+POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "60"))
+LIVE_KEEP = int(os.getenv("LIVE_KEEP", "500"))     # tweets recientes por consulta en memoria
+
+
+class Watermarks:
+    """
+    Último `since_id` visto por consulta, persistido como JSON junto a
+    `chroma_db` (misma escritura atómica que `IngestCheckpoint`). Una
+    instancia por archivo y proceso (`shared`); al escribir se toma el
+    máximo con lo que haya en disco.
+    """
+
+    def __init__(self, path: str = "chroma_db/live_state.json"):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.state: dict[str, str] = read_json(self.path)
+
+    def get(self, query: str) -> str | None:
+        with self._lock:
+            return self.state.get(query)
+
+    def advance(self, query: str, tweet_ids) -> None:
+        """Sube el watermark al id más alto (los ids de Twitter son crecientes)."""
+        ids = [int(i) for i in tweet_ids]
+        if not ids:
+            return
+        with self._lock:
+            disk = read_json(self.path)
+            for q, v in disk.items():
+                if q not in self.state or int(v) > int(self.state[q]):
+                    self.state[q] = v
+            cur = self.state.get(query)
+            top = max(ids) if cur is None else max(max(ids), int(cur))
+            self.state[query] = str(top)
+            write_json_atomic(self.path, self.state)
+
+
+class LiveCollector:
+    """
+    Hilo en segundo plano que sondea Twitter cada `interval` segundos:
+    - por cada consulta vigilada pide sólo tweets posteriores a su watermark;
+    - etiqueta y embebe los nuevos fuera del hilo de Streamlit
+      (`agent.ingest_live`) y los confirma en Chroma y en el corpus;
+    - guarda los últimos resultados ya procesados de cada consulta para
+      que la pestaña Live los lea al instante con `results()`.
+    Sin consultas explícitas vigila las cuentas de `handles`.
+    """
+
+    def __init__(self, agent, queries=None, *, interval: float = POLL_SECONDS, n: int = 100, fetch=search_since):
+        self.agent = agent
+        self.interval = interval
+        self.n = n
+        self.fetch = fetch
+        self.marks = shared(Watermarks, f"{agent.db.path}/live_state.json")
+        self.queries: dict[str, str] = {}          # consulta del usuario → consulta API
+        self.recent: dict[str, deque] = {}
+        self.primed: set[str] = set()              # consultas ya sondeadas en esta sesión
+        self.last_poll: float | None = None
+        self.last_error: str | None = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        for q in queries if queries is not None else chunked_queries(handles.copy()):
+            self.watch(q)
+
+    # ── consultas vigiladas ────────────────────────────────────────
+    def watch(self, query: str) -> None:
+        """Añade una consulta y fuerza un sondeo inmediato si es nueva."""
+        with self._lock:
+            if query in self.queries:
+                return
+            self.queries[query] = live_query(query)
+            self.recent[query] = deque(maxlen=LIVE_KEEP)
+        self._wake.set()
+
+    def results(self, query: str) -> pd.DataFrame:
+        """Tweets ya etiquetados de `query`, del más reciente al más antiguo."""
+        with self._lock:
+            rows = list(self.recent.get(query, ()))
+        rows.sort(key=lambda r: int(r["doc_id"]), reverse=True)   # snowflake ids: más nuevo primero
+        return pd.DataFrame(rows)
+
+    # ── ciclo de sondeo ────────────────────────────────────────────
+    def poll_once(self) -> int:
+        """Un sondeo completo; devuelve cuántos tweets nuevos se procesaron."""
+        with self._lock:
+            watched = dict(self.queries)
+        # la primera vez en la sesión se trae la ventana reciente completa
+        # (para poder mostrarla); los ya conocidos no se re-etiquetan
+        marks = {
+            api: self.marks.get(api) if q in self.primed else None for q, api in watched.items()
+        }
+        fetched = self.fetch(marks, self.n)
+
+        new = 0
+        for query, api in watched.items():
+            tweets = fetched.get(api) or []
+            self.primed.add(query)
+            if not tweets:
+                continue
+            frame = self.agent.ingest_live(pd.DataFrame(tweets))
+            cols = [c for c in ("doc_id", "text", "topic", "sentiment", "created_at") if c in frame]
+            with self._lock:
+                self.recent[query].extend(frame[cols].to_dict("records"))
+            # el watermark sólo avanza cuando el lote ya está confirmado
+            self.marks.advance(api, [t["doc_id"] for t in tweets])
+            new += len(tweets)
+        self.last_poll = time.time()
+        return new
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+                self.last_error = None
+            except Exception as e:          # el hilo no debe morir por un fallo de red
+                self.last_error = str(e)
+                log.warning(f"LiveCollector: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self) -> "LiveCollector":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="live-collector", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,157 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# ── configuración ─────────────────────────────────────────────────
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_SAMPLES = int(os.getenv("METRICS_SAMPLES", "2048"))   # latencias recientes por etapa
+PREFIX = "fta"
+
+# límites (s) del histograma exportado, al estilo Prometheus
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metrics:
+    """
+    Registro en memoria de tiempos y contadores del proceso:
+    - por etapa (`clean`, `finbert`, `vector_add`, `llm`…): llamadas,
+      elementos procesados, segundos acumulados, histograma de latencia
+      y una ventana de latencias recientes para percentiles;
+    - contadores libres (`inc`), p. ej. hits de la caché de respuestas.
+    El coste por llamada es un `perf_counter` y un lock: se deja activo
+    en producción. `export()` produce el formato de texto de Prometheus.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, samples: int = METRICS_SAMPLES):
+        self.enabled = enabled
+        self.samples = samples
+        self.stages: dict[str, dict] = {}
+        self.counters: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    # ── registro ───────────────────────────────────────────────────
+    def observe(self, stage: str, seconds: float, items: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            s = self.stages.get(stage)
+            if s is None:
+                s = self.stages[stage] = {
+                    "calls": 0,
+                    "items": 0,
+                    "seconds": 0.0,
+                    "buckets": [0] * len(BUCKETS),
+                    "recent": deque(maxlen=self.samples),
+                }
+            s["calls"] += 1
+            s["items"] += items
+            s["seconds"] += seconds
+            s["recent"].append(seconds)
+            for i, le in enumerate(BUCKETS):
+                if seconds <= le:
+                    s["buckets"][i] += 1
+                    break
+
+    def inc(self, name: str, n: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, stage: str, items: int = 1):
+        """`with metrics.timer("topic", len(df)): ...`"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0, items)
+
+    def timed(self, stage: str, items=None):
+        """
+        Decorador: mide cada llamada. `items(*args, **kwargs)` da el número
+        de elementos procesados (por defecto 1, p. ej. una consulta).
+        """
+
+        def deco(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    n = items(*args, **kwargs) if items else 1
+                    self.observe(stage, time.perf_counter() - t0, n)
+
+            return wrapper
+
+        return deco
+
+    # ── lectura ────────────────────────────────────────────────────
+    def snapshot(self) -> dict:
+        """Resumen por etapa con throughput y percentiles (ms) de las latencias recientes."""
+        with self._lock:
+            out = {}
+            for name, s in self.stages.items():
+                recent = np.fromiter(s["recent"], dtype=np.float64)
+                p50, p95, p99 = np.percentile(recent, [50, 95, 99]) * 1e3 if len(recent) else (0.0,) * 3
+                out[name] = {
+                    "calls": s["calls"],
+                    "items": s["items"],
+                    "seconds": round(s["seconds"], 6),
+                    "items_per_s": round(s["items"] / s["seconds"], 1) if s["seconds"] else 0.0,
+                    "p50_ms": round(float(p50), 3),
+                    "p95_ms": round(float(p95), 3),
+                    "p99_ms": round(float(p99), 3),
+                }
+            return {"stages": out, "counters": dict(self.counters)}
+
+    def export(self) -> str:
+        """Volcado en formato de texto de Prometheus (exposition format 0.0.4)."""
+        lines = [
+            f"# HELP {PREFIX}_stage_seconds Latencia por llamada de cada etapa del pipeline.",
+            f"# TYPE {PREFIX}_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self.stages.items())
+            for name, s in stages:
+                cum = 0
+                for le, n in zip(BUCKETS, s["buckets"]):
+                    cum += n
+                    lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="{le:g}"}} {cum}')
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {s["calls"]}')
+                lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{name}"}} {s["seconds"]:.6f}')
+                lines.append(f'{PREFIX}_stage_seconds_count{{stage="{name}"}} {s["calls"]}')
+            lines += [
+                f"# HELP {PREFIX}_stage_items_total Elementos (tweets, documentos, consultas) procesados por etapa.",
+                f"# TYPE {PREFIX}_stage_items_total counter",
+            ]
+            lines += [f'{PREFIX}_stage_items_total{{stage="{name}"}} {s["items"]}' for name, s in stages]
+            if self.counters:
+                lines += [
+                    f"# HELP {PREFIX}_events_total Contadores de eventos (cachés, reintentos…).",
+                    f"# TYPE {PREFIX}_events_total counter",
+                ]
+                lines += [f'{PREFIX}_events_total{{name="{k}"}} {v:g}' for k, v in sorted(self.counters.items())]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Escribe `export()` de forma atómica (p. ej. para el textfile collector de node_exporter)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            fh.write(self.export())
+        os.replace(tmp, path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+
+# Registro compartido del proceso
+metrics = Metrics()
@@ -0,0 +1,333 @@
+"""
+Servicio local de inferencia y recuperación compartido por varias sesiones.
+
+    python -m src.cli serve --db chroma_db --port 8765
+    MODEL_SERVER_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Un único proceso carga FinBERT, Mini-LM, el clasificador de temas y el
+`PersistentClient` de Chroma. Las peticiones de sentimiento, embeddings,
+temas y consultas que llegan de distintas sesiones dentro de una ventana
+corta (`BATCH_WINDOW_MS`) se juntan en una sola llamada al modelo.
+"""
+import base64
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src.metrics import metrics
+
+# ── configuración ─────────────────────────────────────────────────
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL", "")          # vacío ⇒ modelos en el propio proceso
+MODEL_SERVER_PORT = int(os.getenv("MODEL_SERVER_PORT", "8765"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "10"))   # espera máxima para juntar peticiones
+BATCH_MAX = int(os.getenv("BATCH_MAX", "256"))                # elementos por lote
+
+
+# ── formato de transporte ─────────────────────────────────────────
+# Los embeddings viajan como float32 en base64 (≈4× menos que listas JSON)
+def pack(vectors) -> dict:
+    arr = np.asarray(vectors, dtype=np.float32)
+    arr = arr.reshape(len(arr), -1) if arr.size else arr.reshape(0, 0)
+    return {"shape": list(arr.shape), "data": base64.b64encode(arr.tobytes()).decode()}
+
+
+def unpack(blob: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(blob["data"]), dtype=np.float32).reshape(blob["shape"])
+
+
+# ── micro-batching ────────────────────────────────────────────────
+class MicroBatcher:
+    """
+    Junta las peticiones concurrentes de `submit` en una sola llamada a
+    `fn(elementos) -> resultados` (misma longitud y orden): el primer
+    elemento abre una ventana de `window_ms`; se cierra antes si el lote
+    llega a `max_items`. Cada llamador recibe su tramo del resultado.
+    """
+
+    def __init__(self, name: str, fn, window_ms: float = BATCH_WINDOW_MS, max_items: int = BATCH_MAX):
+        self.name = name
+        self.fn = fn
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._loop, name=f"batch-{name}", daemon=True).start()
+
+    def submit(self, items: list) -> list:
+        if not items:
+            return []
+        fut: Future = Future()
+        self._queue.put((list(items), fut))
+        return fut.result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        n = len(batch[0][0])
+        deadline = time.monotonic() + self.window
+        while n < self.max_items:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            n += len(batch[-1][0])
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            flat = [x for items, _ in batch for x in items]
+            t0 = time.perf_counter()
+            try:
+                out = self.fn(flat)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            # llamadas vs. elementos de `batch_<op>` ⇒ tamaño medio del lote
+            metrics.observe(f"batch_{self.name}", time.perf_counter() - t0, len(flat))
+            i = 0
+            for items, fut in batch:
+                fut.set_result(out[i : i + len(items)])
+                i += len(items)
+
+
+# ── servidor ──────────────────────────────────────────────────────
+class ModelServer:
+    """
+    Dueño único de los modelos y de Chroma. Operaciones (POST JSON):
+    /sentiment, /topics y /embed {"texts"}; /query {"text", "k", filtros};
+    /add {"ids", "texts", "embeddings"?, "metadatas"?}; /set_copies
+    {"counts"}; /metadata {"ids"}. GET /health y GET /metrics (formato Prometheus).
+    """
+
+    def __init__(self, db_path: str = "chroma_db", host: str = "127.0.0.1", port: int = MODEL_SERVER_PORT,
+                 window_ms: float = BATCH_WINDOW_MS, max_items: int = BATCH_MAX):
+        from src.data_pipeline import finbert_sentiment, predict_topics
+        from src.vector_db import VectorDB
+
+        self.db = VectorDB(db_path)
+        self._write_lock = threading.Lock()   # Chroma + IdSet: una escritura a la vez
+        self.batchers = {
+            "sentiment": MicroBatcher("sentiment", finbert_sentiment, window_ms, max_items),
+            "topics": MicroBatcher("topics", lambda t: predict_topics(t, self.db.embed), window_ms, max_items),
+            "embed": MicroBatcher("embed", self.db.embed, window_ms, max_items),
+            "query": MicroBatcher("query", self.db.query_batch, window_ms, max_items),
+        }
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm_up(self) -> None:
+        from src.data_pipeline import get_topic_clf
+        from src.inference import finbert_model, finbert_tokenizer, get_engine
+
+        self.db.warm_up()
+        finbert_tokenizer()
+        if get_engine().workers <= 1:
+            finbert_model(get_engine().backend)
+        get_topic_clf()
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+    def start(self) -> "ModelServer":
+        """Sirve en un hilo daemon (pruebas y benchmarks)."""
+        threading.Thread(target=self.serve_forever, name="model-server", daemon=True).start()
+        return self
+
+    def shutdown(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # ── operaciones ────────────────────────────────────────────────
+    OPS = ("sentiment", "topics", "embed", "query", "add", "set_copies", "metadata")
+
+    def handle(self, op: str, req: dict) -> dict:
+        if op == "sentiment":
+            return {"labels": self.batchers["sentiment"].submit(req["texts"])}
+        if op == "topics":
+            return {"topics": self.batchers["topics"].submit(req["texts"])}
+        if op == "embed":
+            return {"embeddings": pack(self.batchers["embed"].submit(req["texts"]))}
+        if op == "query":
+            if "query_embedding" in req:
+                req["query_embedding"] = unpack(req["query_embedding"])[0].tolist()
+            return {"hits": self.batchers["query"].submit([req])[0]}
+        if op == "add":
+            return self._add(req)
+        if op == "metadata":
+            return {"metadatas": self.db.get_metadata(req["ids"])}
+        with self._write_lock:
+            self.db.set_copies(req["counts"])
+        return {}
+
+    def _add(self, req: dict) -> dict:
+        new_ids, new_embs = [], []
+        embeddings = unpack(req["embeddings"]).tolist() if req.get("embeddings") else None
+
+        def collect(ids, embs):
+            new_ids.extend(ids)
+            new_embs.extend(embs)
+
+        with self._write_lock:
+            # los embeddings de los documentos nuevos vuelven al cliente
+            # para que invalide su caché de respuestas
+            self.db.on_write.append(collect)
+            try:
+                stats = self.db.add(req["ids"], req["texts"], embeddings, req.get("metadatas"))
+            finally:
+                self.db.on_write.remove(collect)
+        out = {"stats": stats, "ids": new_ids}
+        if new_ids:
+            out["embeddings"] = pack(new_embs)
+        return out
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: el cliente reutiliza la conexión
+
+    def log_message(self, *_):
+        pass
+
+    def _send(self, code: int, body: bytes, ctype: str = "application/json") -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, json.dumps({"ok": True, "db": self.server.app.db.path}).encode())
+        elif self.path == "/metrics":
+            self._send(200, metrics.export().encode(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        op = self.path.strip("/")
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))   # se lee siempre (keep-alive)
+        if op not in ModelServer.OPS:
+            self._send(404, b'{"error": "not found"}')
+            return
+        try:
+            req = json.loads(raw or b"{}")
+            if not isinstance(req, dict):
+                raise ValueError("se esperaba un objeto JSON")
+        except ValueError as e:     # incluye JSONDecodeError y UTF-8 inválido
+            self._send(400, json.dumps({"error": f"JSON inválido: {e}"}).encode())
+            return
+        try:
+            body = self.server.app.handle(op, req)
+        except KeyError as e:
+            self._send(400, json.dumps({"error": f"falta el campo {e}"}).encode())
+            return
+        except Exception as e:
+            self._send(500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode())
+            return
+        self._send(200, json.dumps(body).encode())
+
+
+# ── cliente ───────────────────────────────────────────────────────
+class ModelClient:
+    """
+    Cliente HTTP de `ModelServer`. `predict` hace que sirva como motor
+    de FinBERT (`finbert_sentiment(textos, engine=cliente)`).
+    """
+
+    def __init__(self, url: str = MODEL_SERVER_URL, timeout: float = 120):
+        import httpx
+
+        self.url = url.rstrip("/")
+        self._http = httpx.Client(base_url=self.url, timeout=timeout)
+
+    def _post(self, op: str, body: dict) -> dict:
+        resp = self._http.post(f"/{op}", json=body)
+        if resp.status_code != 200:
+            raise RuntimeError(f"model server /{op}: {resp.status_code} {resp.text[:200]}")
+        return resp.json()
+
+    def health(self) -> dict:
+        return self._http.get("/health").raise_for_status().json()
+
+    def sentiment(self, texts: list[str]) -> list[str]:
+        return self._post("sentiment", {"texts": list(texts)})["labels"] if len(texts) else []
+
+    predict = sentiment
+
+    def topics(self, texts: list[str], embed=None) -> list[str]:
+        return self._post("topics", {"texts": list(texts)})["topics"] if len(texts) else []
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        if not len(texts):
+            return []
+        return unpack(self._post("embed", {"texts": list(texts)})["embeddings"]).tolist()
+
+
+class RemoteVectorDB:
+    """
+    Misma interfaz que usa el agente de `VectorDB` (add, query, embed,
+    embed_query, set_copies, on_write, path), servida por `ModelServer`.
+    `path` sigue siendo local: checkpoint e índice de casi-duplicados.
+    """
+
+    def __init__(self, client: ModelClient, path: str = "chroma_db"):
+        self.client = client
+        self.path = path
+        self.on_write: list = []
+        self.last_stats: dict = {}
+
+    def warm_up(self) -> None:
+        self.client.health()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return self.client.embed(texts)
+
+    def embed_query(self, query_text: str) -> list[float]:
+        return self.client.embed([query_text])[0]
+
+    def add(self, ids, texts, embeddings=None, metadatas=None, *, batch_size: int | None = None) -> dict:
+        body = {"ids": list(ids), "texts": list(texts), "metadatas": metadatas}
+        if embeddings is not None:
+            body["embeddings"] = pack(embeddings)
+        out = self.client._post("add", body)
+        if out["ids"]:
+            embs = unpack(out["embeddings"])
+            for fn in self.on_write:
+                fn(out["ids"], embs)
+        self.last_stats = out["stats"]
+        return self.last_stats
+
+    def query(self, query_text: str, k: int = 30, *, query_embedding=None, **filters) -> list[dict]:
+        body = {"text": query_text, "k": k, **filters}
+        if query_embedding is not None:
+            body["query_embedding"] = pack([query_embedding])
+        for key in ("since", "until"):
+            if body.get(key) is not None:
+                body[key] = str(body[key])
+        for key, v in filters.items():
+            # `VectorDB.query` acepta sets, tuplas, Series… (p. ej. tickers); JSON sólo listas
+            if hasattr(v, "__iter__") and not isinstance(v, (str, bytes, dict, list)):
+                body[key] = list(v)
+        return self.client._post("query", body)["hits"]
+
+    def get_metadata(self, ids) -> dict[str, dict]:
+        ids = list(ids)
+        return self.client._post("metadata", {"ids": ids})["metadatas"] if ids else {}
+
+    def set_copies(self, counts: dict) -> None:
+        if counts:
+            self.client._post("set_copies", {"counts": {k: int(v) for k, v in counts.items()}})
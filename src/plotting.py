@@ -23,3 +23,25 @@ def build_sentiment_bar(pivot_df: pd.DataFrame, metric: str):
         coloraxis_showscale=False,
     )
     return fig
+
+
+def build_sentiment_timeseries(series_df: pd.DataFrame, metric: str):
+    """
+    Serie temporal por ticker (una línea por ticker) a partir de
+    `agent.sentiment_series()`.
+    """
+    fig = px.line(
+        series_df,
+        x="bucket",
+        y=metric,
+        color="tickers",
+        markers=True,
+        height=450,
+        template="plotly_dark",
+    )
+    fig.update_layout(
+        xaxis_title="Fecha (UTC)",
+        yaxis_title=metric.replace("_", " ").title(),
+        legend_title="Ticker",
+    )
+    return fig
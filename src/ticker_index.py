@@ -0,0 +1,67 @@
+import pandas as pd
+
+SENTIMENTS = ("positive", "neutral", "negative")
+_SENT_COL = {s: i for i, s in enumerate(SENTIMENTS)}
+
+
+class TickerIndex:
+    """
+    Agregados por ticker mantenidos de forma incremental:
+    - tabla ticker → [positive, neutral, negative] (menciones por sentimiento);
+    - índice invertido ticker → filas del corpus donde aparece.
+    `pivot()` y `mention_counts()` leen de aquí en vez de re-agrupar el corpus.
+    """
+
+    def __init__(self):
+        self.counts: dict[str, list[int]] = {}
+        self.rows: dict[str, list[int]] = {}
+        self.mentions: dict[str, int] = {}
+        self._table: pd.DataFrame | None = None
+
+    # ── actualización incremental ──────────────────────────────────
+    def update(self, tickers, sentiments, start_row: int) -> None:
+        """Suma un lote cuyas filas ocupan `start_row`, `start_row + 1`, …"""
+        for row, (tks, sent) in enumerate(zip(tickers, sentiments), start=start_row):
+            col = _SENT_COL.get(sent)
+            for t in tks:
+                if not t:
+                    continue
+                c = self.counts.get(t)
+                if c is None:
+                    c = self.counts[t] = [0, 0, 0]
+                    self.rows[t] = []
+                    self.mentions[t] = 0
+                if col is not None:
+                    c[col] += 1
+                self.mentions[t] += 1
+                rows = self.rows[t]
+                if not rows or rows[-1] != row:   # un ticker repetido en el tweet
+                    rows.append(row)
+        self._table = None
+
+    # ── consultas ──────────────────────────────────────────────────
+    def table(self) -> pd.DataFrame:
+        """Tabla completa ticker/negative/neutral/positive/total (cacheada)."""
+        if self._table is None:
+            tab = pd.DataFrame.from_dict(self.counts, orient="index", columns=list(SENTIMENTS))
+            tab = tab[["negative", "neutral", "positive"]]
+            tab.index.name = "tickers"
+            tab["total"] = tab.sum(axis=1)
+            self._table = tab.reset_index()
+        return self._table
+
+    def pivot(self, min_m: int = 20) -> pd.DataFrame:
+        piv = self.table()
+        piv = piv[piv["total"] >= min_m].copy()
+        piv["pos_ratio"] = piv["positive"] / piv["total"]
+        piv["neg_ratio"] = piv["negative"] / piv["total"]
+        return piv.sort_values("neg_ratio", ascending=False)
+
+    def mention_counts(self) -> pd.Series:
+        """Menciones totales por ticker (cualquier sentimiento), de mayor a menor."""
+        counts = pd.Series(self.mentions, name="count", dtype="int64")
+        counts.index.name = "tickers"
+        return counts.sort_values(ascending=False)
+
+    def rows_for(self, ticker: str) -> list[int]:
+        return self.rows.get(ticker, [])
@@ -1,6 +1,13 @@
+import asyncio
 import os
-import tweepy
-from time import sleep
+import random
+import threading
+import time
+from datetime import datetime
+
+import httpx
+
+from src.metrics import metrics
 
 # ── Lista de cuentas financieras ──
 handles = [
@@ -15,11 +22,15 @@ handles = [
     "IMFNews"]
 
 
-# ── autenticación ────────────────────────────────────────────────
-client = tweepy.Client(
-    bearer_token=os.getenv("TWITTER_BEARER"),
-    wait_on_rate_limit=True,
-)
+# ── configuración ────────────────────────────────────────────────
+# TWITTER_API_URL permite apuntar a un servidor local falso en pruebas.
+API_URL = os.getenv("TWITTER_API_URL", "https://api.twitter.com/2")
+TWEET_FIELDS = "id,text,created_at,lang"
+RATE_PER_S = 450 / 900       # search/recent (app-auth): 450 peticiones / 15 min
+BURST = 10
+MAX_RETRIES = 5
+BACKOFF_S = float(os.getenv("TWITTER_BACKOFF_S", "1"))   # base del backoff exponencial (5xx, red)
+
 
 # ── helpers ───────────────────────────────────────────────────────
 def chunked_queries(handles_list, max_len=512) -> list[str]:
@@ -37,46 +48,231 @@ def chunked_queries(handles_list, max_len=512) -> list[str]:
     return ["(" + " OR ".join(f"from:{h}" for h in c) + ") -is:retweet" for c in chunks]
 
 
-def _safe_request(fun, *args, **kwargs):
-    """Envuelve la llamada a la API para manejar rate-limits."""
-    try:
-        return fun(*args, **kwargs)
-    except tweepy.TooManyRequests:
-        sleep(15)
-    except Exception as e:
-        print(f"[Twitter error] {e}")
+class TokenBucket:
+    """
+    Limitador de peticiones a la API. El cupo es del token, no de la
+    llamada: el proceso comparte un único bucket (`_BUCKET`) entre
+    búsquedas, hilos y event loops (`search` crea uno nuevo con
+    `asyncio.run` en cada llamada), por eso el estado se protege con un
+    `threading.Lock` y la espera se hace fuera del lock con `asyncio.sleep`.
+    `pause_until` lo usa el cliente para respetar `x-rate-limit-reset`.
+    """
+
+    def __init__(self, rate: float = RATE_PER_S, capacity: int = BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def _try_take(self) -> float:
+        """Toma un token y devuelve 0, o los segundos que hay que esperar."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.resume_at:
+                return self.resume_at - now
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while (wait := self._try_take()) > 0:
+            await asyncio.sleep(wait)
+
+    def pause_until(self, epoch_s: float) -> None:
+        """Bloquea el bucket hasta el epoch indicado (reloj de pared)."""
+        with self._lock:
+            now = time.monotonic()
+            self.resume_at = max(self.resume_at, now + max(0.0, epoch_s - time.time()))
+            self.tokens = 0.0
+            self.updated = max(now, self.resume_at)
+
+
+# Bucket del proceso: el límite de la API se consume entre llamadas
+_BUCKET = TokenBucket()
+
+
+def _backoff(attempt: int) -> float:
+    return BACKOFF_S * (2 ** attempt + random.random())
+
+
+def _to_record(t: dict) -> dict:
+    created = t.get("created_at")
+    if created:
+        created = datetime.fromisoformat(created.replace("Z", "+00:00"))
+    return {"doc_id": str(t["id"]), "text": t["text"], "created_at": created}
+
+
+async def _request(client: httpx.AsyncClient, bucket: TokenBucket, params: dict) -> dict | None:
+    """GET /tweets/search/recent con reintentos y backoff según cabeceras."""
+    for attempt in range(MAX_RETRIES):
+        await bucket.acquire()
+        t0 = time.perf_counter()
+        try:
+            resp = await client.get("/tweets/search/recent", params=params)
+        except httpx.TransportError as e:
+            metrics.inc("twitter_transport_error")
+            print(f"[Twitter error] {e}")
+            await asyncio.sleep(_backoff(attempt))
+            continue
+
+        if resp.headers.get("x-rate-limit-remaining") == "0" and "x-rate-limit-reset" in resp.headers:
+            bucket.pause_until(float(resp.headers["x-rate-limit-reset"]))
+        metrics.observe("twitter_request", time.perf_counter() - t0)
+
+        if resp.status_code == 429:
+            metrics.inc("twitter_rate_limited")
+            reset = resp.headers.get("x-rate-limit-reset")
+            if reset:
+                bucket.pause_until(float(reset))
+            else:
+                await asyncio.sleep(_backoff(attempt))
+            continue
+        if resp.status_code >= 500:
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        if resp.status_code != 200:
+            print(f"[Twitter error] {resp.status_code}: {resp.text[:200]}")
+            return None
+        return resp.json()
+
+    print(f"[Twitter error] reintentos agotados para {params.get('query', '')[:60]}…")
     return None
 
+
+async def _paginate(client, bucket, query: str, limit: int, since_id: str | None = None):
+    """Sigue `next_token` hasta reunir `limit` tweets en inglés; produce una página a la vez."""
+    params = {"query": query, "tweet.fields": TWEET_FIELDS}
+    if since_id:
+        params["since_id"] = since_id
+    seen = 0
+    while seen < limit:
+        params["max_results"] = max(10, min(100, limit - seen))
+        body = await _request(client, bucket, params)
+        if not body or not body.get("data"):
+            return
+        yield body["data"]
+        seen += sum(t.get("lang", "en") == "en" for t in body["data"])
+        token = body.get("meta", {}).get("next_token")
+        if not token:
+            return
+        params["next_token"] = token
+
+
 # ── búsqueda principal ───────────────────────────────────────────
-def search(query: str | None = None, n: int = 30) -> list[dict]:
-    tweets = []
-    if query:
-        resp = _safe_request(
-            client.search_recent_tweets,
-            query=query + " -is:retweet",
-            tweet_fields=["id", "text", "created_at", "lang"],
-            max_results=min(n, 100),
-        )
-        if not resp or resp.data is None:
-            return []
-        tweets = resp.data
-    else:
-        collected = []
-        for q in chunked_queries(handles.copy()):
-            resp = _safe_request(
-                client.search_recent_tweets,
-                query=q,
-                tweet_fields=["id", "text", "created_at", "lang"],
-                max_results=100,
-            )
-            if resp and resp.data:
-                collected.extend(resp.data)
-            if len(collected) >= n:
-                break
-        tweets = collected[:n]
-
-    return [
-        {"doc_id": str(t.id), "text": t.text, "created_at": t.created_at}
-        for t in tweets
-        if getattr(t, "lang", "en") == "en"
-    ]
+async def search_stream(
+    query: str | None = None,
+    n: int = 30,
+    *,
+    since_id: str | None = None,
+    base_url: str = API_URL,
+    bearer: str | None = None,
+    bucket: TokenBucket | None = None,
+):
+    """
+    Generador asíncrono de tweets (dicts doc_id/text/created_at) en el
+    orden en que llegan. Sin `query` lanza en paralelo una búsqueda por
+    cada bloque de `handles`, bajo el token bucket del proceso.
+    """
+    bearer = bearer or os.getenv("TWITTER_BEARER")
+    bucket = bucket or _BUCKET
+    headers = {"Authorization": f"Bearer {bearer}"}
+    queries = [query + " -is:retweet"] if query else chunked_queries(handles.copy())
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30) as client:
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def worker(q: str) -> None:
+            try:
+                async for page in _paginate(client, bucket, q, n, since_id):
+                    await queue.put(page)
+            finally:
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(worker(q)) for q in queries]
+        pending, emitted = len(tasks), 0
+        try:
+            while pending and emitted < n:
+                page = await queue.get()
+                if page is None:
+                    pending -= 1
+                    continue
+                for t in page:
+                    if t.get("lang", "en") != "en":
+                        continue
+                    yield _to_record(t)
+                    emitted += 1
+                    if emitted >= n:
+                        break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _collect(query, n, **kwargs) -> list[dict]:
+    return [t async for t in search_stream(query, n, **kwargs)]
+
+
+def _run(coro):
+    """asyncio.run también desde hilos/notebooks con un loop ya activo."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    out = {}
+
+    def target():
+        try:
+            out["result"] = asyncio.run(coro)
+        except BaseException as e:   # se relanza en el hilo que llama
+            out["error"] = e
+
+    th = threading.Thread(target=target)
+    th.start()
+    th.join()
+    if "error" in out:
+        raise out["error"]
+    return out["result"]
+
+
+def search(query: str | None = None, n: int = 30, **kwargs) -> list[dict]:
+    """Versión síncrona de `search_stream`: devuelve hasta `n` tweets en inglés."""
+    return _run(_collect(query, n, **kwargs))
+
+
+# ── sondeo incremental (watermarks since_id) ─────────────────────
+def live_query(query: str) -> str:
+    """Consulta tal y como se envía a la API (sin retweets)."""
+    return query if "-is:retweet" in query else f"{query} -is:retweet"
+
+
+async def _fetch_since(watermarks: dict, n: int, base_url: str, bearer: str | None,
+                       bucket: TokenBucket | None = None) -> dict:
+    bearer = bearer or os.getenv("TWITTER_BEARER")
+    bucket = bucket or _BUCKET
+    headers = {"Authorization": f"Bearer {bearer}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30) as client:
+
+        async def one(q: str, since_id) -> list[dict]:
+            out = []
+            async for page in _paginate(client, bucket, q, n, since_id):
+                out.extend(_to_record(t) for t in page if t.get("lang", "en") == "en")
+            return out
+
+        results = await asyncio.gather(*(one(q, s) for q, s in watermarks.items()))
+    return dict(zip(watermarks, results))
+
+
+def search_since(watermarks: dict, n: int = 100, *, base_url: str = API_URL, bearer: str | None = None,
+                 bucket: TokenBucket | None = None) -> dict:
+    """
+    Para cada consulta (ya en forma `live_query`) pide sólo los tweets con
+    id mayor que su watermark (`None` = ventana reciente completa), todas
+    en paralelo. Devuelve {consulta: [tweets]}.
+    """
+    return _run(_fetch_since(dict(watermarks), n, base_url, bearer, bucket))
@@ -1,49 +1,397 @@
-import streamlit as st
-from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+from src.cache import cached_apply, load_once
+from src.data_pipeline import INFERENCE_BACKEND
+from src.inference import OnnxEmbedder, check_backend, quantize_int8
+from src.keyword_index import KeywordIndex
+from src.metrics import metrics
+
+EMBEDDER_MODEL = "all-MiniLM-L6-v2"
+WRITE_BATCH = int(os.getenv("CHROMA_WRITE_BATCH", "1000"))
+
+
+@load_once
+def load_embedder(backend: str = INFERENCE_BACKEND):
+    """Mini-LM en CPU: fp32 (torch), int8 dinámico o grafo ONNX."""
+    check_backend(backend)
+    if backend == "onnx":
+        return OnnxEmbedder(f"sentence-transformers/{EMBEDDER_MODEL}")
+    from sentence_transformers import SentenceTransformer
 
-@st.cache_resource
-def load_embedder() -> SentenceTransformer:
     # device='cpu' garantiza que Mini-LM no use la GPU
-    return SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+    model = SentenceTransformer(EMBEDDER_MODEL, device="cpu")
+    return quantize_int8(model) if backend == "int8" else model
+
+
+def make_metadatas(df: pd.DataFrame) -> list[dict]:
+    """
+    Metadatos Chroma por fila: sentiment, topic, tickers (separados por coma)
+    y created_at (epoch en segundos, sólo si existe; Chroma no admite None).
+    Cada ticker se guarda además como flag `t_<TICKER>: True`, porque los
+    filtros de metadatos de Chroma no tienen `$contains` sobre strings.
+    """
+    n = len(df)
+    sentiments = df["sentiment"].astype(str).tolist() if "sentiment" in df else [None] * n
+    topics = df["topic"].astype(str).tolist() if "topic" in df else [None] * n
+    tickers = df["tickers"].tolist() if "tickers" in df else [[]] * n
+    if "created_at" in df:
+        created = pd.to_datetime(df["created_at"], utc=True, errors="coerce")
+        epochs = [None if pd.isna(t) else int(t.timestamp()) for t in created]
+    else:
+        epochs = [None] * n
+
+    metas = []
+    for sent, topic, tks, ts in zip(sentiments, topics, tickers, epochs):
+        meta = {"tickers": ",".join(tks)}
+        meta.update({f"t_{t}": True for t in tks})
+        if sent is not None:
+            meta["sentiment"] = sent
+        if topic is not None:
+            meta["topic"] = topic
+        if ts is not None:
+            meta["created_at"] = ts
+        metas.append(meta)
+    return metas
+
+
+class IdSet:
+    """
+    Conjunto local de doc_ids ya escritos en Chroma, persistido como archivo
+    append-only junto a `chroma_db`. Permite deduplicar *antes* de embeber
+    sin consultar la colección. Si el archivo no existe se reconstruye
+    paginando la colección una sola vez.
+    """
+
+    def __init__(self, path: Path, collection, page: int = 10_000):
+        self.path = path
+        self.ids: set[str] = set()
+        if path.exists():
+            self.ids.update(path.read_text().splitlines())
+        elif collection.count():
+            for offset in range(0, collection.count(), page):
+                got = collection.get(include=[], limit=page, offset=offset)["ids"]
+                self.ids.update(got)
+            path.write_text("".join(f"{i}\n" for i in self.ids))
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add_many(self, ids) -> None:
+        self.ids.update(ids)
+        with self.path.open("a") as fh:
+            fh.writelines(f"{i}\n" for i in ids)
+
+
+@load_once
+def _keyword_index_for(path: str) -> KeywordIndex:
+    return KeywordIndex()
 
 
 class VectorDB:
-    def __init__(self, path: str = "chroma_db"):
-        self.client = PersistentClient(path)
-        self.collection = self.client.get_or_create_collection(
-            name="tweets", metadata={"hnsw:space": "cosine"}
-        )
-        self.embedder = load_embedder()
+    def __init__(
+        self,
+        path: str = "chroma_db",
+        backend: str = INFERENCE_BACKEND,
+        write_batch: int = WRITE_BATCH,
+    ):
+        self.path = path
+        self.backend = backend
+        self.cache_ns = f"{EMBEDDER_MODEL}:{backend}:v1"   # subir la versión si cambia el modelo
+        self.write_batch = write_batch
+        self.last_stats: dict = {}
+        self.on_write: list = []   # callbacks (ids, embeddings) tras cada escritura
+        # chromadb, la colección y Mini-LM se cargan al primer uso (o en el
+        # hilo de `warm_up`), no al construir el objeto
+        self._client = self._collection = self._ids = None
+        self._init_lock = threading.Lock()
+
+    # ── recursos perezosos ─────────────────────────────────────────
+    @property
+    def collection(self):
+        if self._collection is None:
+            with self._init_lock:
+                if self._collection is None:
+                    from chromadb import PersistentClient
+
+                    self._client = PersistentClient(self.path)
+                    self._collection = self._client.get_or_create_collection(
+                        name="tweets", metadata={"hnsw:space": "cosine"}
+                    )
+        return self._collection
+
+    @property
+    def client(self):
+        self.collection
+        return self._client
+
+    @property
+    def ids(self) -> IdSet:
+        if self._ids is None:
+            collection = self.collection
+            with self._init_lock:
+                if self._ids is None:
+                    self._ids = IdSet(Path(self.path) / "doc_ids.txt", collection)
+        return self._ids
+
+    @property
+    def embedder(self):
+        return load_embedder(self.backend)
+
+    def warm_up(self) -> None:
+        """Fuerza la carga de chromadb, la colección, el IdSet y Mini-LM."""
+        self.ids
+        self.embedder
 
     # ── helpers internos ────────────────────────────────────────────
-    def _filter_new(self, ids, texts, embeds):
-        """Filtra doc_ids ya existentes para evitar ValueError de duplicados."""
-        existing = set(self.collection.get(ids=ids, include=[])["ids"])
-        new_ids, new_txt, new_emb = [], [], []
-        for i, t, e in zip(ids, texts, embeds):
-            if i not in existing:
-                new_ids.append(i)
-                new_txt.append(t)
-                new_emb.append(e)
-        return new_ids, new_txt, new_emb
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        """Embeddings en CPU, consultando antes la caché persistente."""
+        return cached_apply(
+            lambda todo: self.embedder.encode(todo, batch_size=64, device="cpu"),
+            texts,
+            self.cache_ns,
+            encode=lambda v: np.asarray(v, dtype=np.float32).tobytes(),
+            decode=lambda b: np.frombuffer(b, dtype=np.float32).tolist(),
+        )
+
+    def _new_positions(self, ids) -> list[int]:
+        """Posiciones de ids nuevos (ni en Chroma ni repetidos en la entrada)."""
+        seen: set[str] = set()
+        keep = []
+        for j, i in enumerate(ids):
+            if i not in self.ids and i not in seen:
+                seen.add(i)
+                keep.append(j)
+        return keep
+
+    def _write(self, ids, texts, embeddings, metadatas) -> float:
+        t0 = time.perf_counter()
+        # upsert: idempotente aunque el IdSet local vaya por detrás de Chroma
+        self.collection.upsert(
+            ids=ids, documents=texts, embeddings=embeddings, metadatas=metadatas
+        )
+        self.ids.add_many(ids)
+        for fn in self.on_write:
+            fn(ids, embeddings)
+        return time.perf_counter() - t0
+
+    def _keyword_index(self, page: int = 10_000) -> KeywordIndex:
+        """
+        Índice BM25 compartido por todas las instancias sobre este `path`
+        (como `shared`); la primera vez se carga paginando la colección y
+        después sólo lee lo añadido por cualquier escritor.
+        """
+        index = _keyword_index_for(str(Path(self.path).resolve()))
+        index.sync(self.collection, page)
+        return index
+
+    @staticmethod
+    def _where(tickers=None, sentiment=None, topic=None, since=None, until=None) -> dict | None:
+        """Traduce los filtros a una cláusula `where` de Chroma."""
+        def as_list(v):
+            return [v] if isinstance(v, str) else list(v)
+
+        conds = []
+        if tickers:
+            flags = [{f"t_{t.lstrip('$').upper()}": True} for t in as_list(tickers)]
+            conds.append(flags[0] if len(flags) == 1 else {"$or": flags})
+        if sentiment:
+            conds.append({"sentiment": {"$in": as_list(sentiment)}})
+        if topic:
+            conds.append({"topic": {"$in": as_list(topic)}})
+        if since is not None:
+            conds.append({"created_at": {"$gte": int(pd.Timestamp(since).timestamp())}})
+        if until is not None:
+            conds.append({"created_at": {"$lte": int(pd.Timestamp(until).timestamp())}})
+        if not conds:
+            return None
+        return conds[0] if len(conds) == 1 else {"$and": conds}
 
     # ── API pública ────────────────────────────────────────────────
-    def add(self, ids, texts, embeddings=None):
-        """Añade documentos deduplicando IDs; calcula embeddings si faltan."""
-        if embeddings is None:
-            # ───────────────────────────────────────────────────────────────
-            # 2) Embeddings en CPU para estabilidad
-            embeddings = (
-                self.embedder.encode(texts, batch_size=64, device="cpu")
-                .tolist()
-            )
-        ids, texts, embeddings = self._filter_new(ids, texts, embeddings)
+    @metrics.timed("vector_add", items=lambda self, ids, *a, **k: len(ids))
+    def add(self, ids, texts, embeddings=None, metadatas=None, *, batch_size: int | None = None) -> dict:
+        """
+        Añade documentos en bloque:
+        1) deduplica por doc_id contra el IdSet local *antes* de embeber;
+        2) escribe en sub-lotes de `batch_size` (`CHROMA_WRITE_BATCH`);
+        3) el embedding del siguiente sub-lote se solapa con la escritura
+           en Chroma del anterior (hilo escritor dedicado).
+        `metadatas` (ver `make_metadatas`) viaja con cada documento para que
+        las consultas devuelvan sentimiento, tema, tickers y fecha.
+        Devuelve (y guarda en `last_stats`) estadísticas de throughput.
+        """
+        t0 = time.perf_counter()
+        batch_size = batch_size or self.write_batch
+        keep = self._new_positions(ids)
+        embed_s = write_s = 0.0
+
+        pending = None
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for start in range(0, len(keep), batch_size):
+                pos = keep[start : start + batch_size]
+                b_ids = [ids[j] for j in pos]
+                b_txt = [texts[j] for j in pos]
+                b_meta = [metadatas[j] for j in pos] if metadatas is not None else None
+                if embeddings is None:
+                    # Embeddings en CPU para estabilidad (con caché por contenido)
+                    te = time.perf_counter()
+                    b_emb = self._embed(b_txt)
+                    embed_s += time.perf_counter() - te
+                else:
+                    b_emb = [embeddings[j] for j in pos]
+                if pending is not None:
+                    write_s += pending.result()
+                pending = writer.submit(self._write, b_ids, b_txt, b_emb, b_meta)
+            if pending is not None:
+                write_s += pending.result()
+
+        seconds = time.perf_counter() - t0
+        self.last_stats = {
+            "received": len(ids),
+            "new": len(keep),
+            "skipped": len(ids) - len(keep),
+            "embed_s": round(embed_s, 3),
+            "write_s": round(write_s, 3),
+            "seconds": round(seconds, 3),
+            "docs_per_s": round(len(keep) / seconds, 1) if seconds else 0.0,
+        }
+        return self.last_stats
+
+    def get_metadata(self, ids) -> dict[str, dict]:
+        """Metadatos guardados de `ids` (sólo los que existen), en sub-lotes."""
+        ids = list(ids)
+        out: dict[str, dict] = {}
+        for i in range(0, len(ids), self.write_batch):
+            got = self.collection.get(ids=ids[i : i + self.write_batch], include=["metadatas"])
+            out.update((d, m or {}) for d, m in zip(got["ids"], got["metadatas"]))
+        return out
+
+    def set_copies(self, counts: dict) -> None:
+        """Guarda en los metadatos `copies` (tamaño del grupo de casi-duplicados)."""
+        ids = [i for i in counts if i in self.ids]
         if ids:
-            self.collection.add(ids=ids, documents=texts, embeddings=embeddings)
+            self.collection.update(ids=ids, metadatas=[{"copies": int(counts[i])} for i in ids])
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embeddings de documentos vía la caché (los reutiliza `add` sin volver a codificar)."""
+        return self._embed(list(texts))
+
+    def embed_query(self, query_text: str) -> list[float]:
+        """Embedding (cacheado) de una pregunta, reutilizable en `query`."""
+        return self._embed([query_text])[0]
+
+    @metrics.timed("vector_query")
+    def query(
+        self,
+        query_text: str,
+        k: int = 30,
+        *,
+        query_embedding=None,
+        tickers=None,
+        sentiment=None,
+        topic=None,
+        since=None,
+        until=None,
+        hybrid: bool = False,
+    ) -> list[dict]:
+        """
+        k-NN sobre el corpus. Devuelve una lista de dicts con `id`,
+        `document`, `distance` y `metadata` (vacío en documentos antiguos).
+        - `tickers`, `sentiment`, `topic`, `since`, `until` se empujan al
+          índice como filtro de metadatos (candidatos más acotados ⇒ k menor).
+        - `hybrid=True` fusiona (Reciprocal Rank Fusion) el ranking vectorial
+          con un ranking BM25 local sobre las palabras de la pregunta; cada
+          hit lleva entonces también `score`.
+        - `query_embedding` evita re-embeber si el llamador ya lo tiene.
+        """
+        where = self._where(tickers, sentiment, topic, since, until)
+        q_emb = [query_embedding] if query_embedding is not None else self._embed([query_text])
+        res = self.collection.query(
+            query_embeddings=q_emb,
+            n_results=k,
+            where=where,
+            include=["documents", "distances", "metadatas"],
+        )
+        hits = self._hits(res, 0)
+        if not hybrid:
+            return hits
+        return self._fuse(hits, self._keyword_hits(query_text, 4 * k, where), k)
+
+    @metrics.timed("vector_query_batch", items=lambda self, requests: len(requests))
+    def query_batch(self, requests: list[dict]) -> list[list[dict]]:
+        """
+        Varias consultas a la vez (dicts con `text`, `k`, `query_embedding`
+        opcional y los filtros de `query`): un solo pase del encoder para
+        todas y una llamada a Chroma por grupo de (k, filtros). Las
+        híbridas se resuelven una a una con `query`.
+        """
+        todo = [r["text"] for r in requests if r.get("query_embedding") is None]
+        fresh = iter(self._embed(todo) if todo else [])
+        embs = [r["query_embedding"] if r.get("query_embedding") is not None else next(fresh) for r in requests]
+
+        out: list = [None] * len(requests)
+        groups: dict[tuple, list[int]] = {}
+        for j, r in enumerate(requests):
+            filters = {f: r.get(f) for f in ("tickers", "sentiment", "topic", "since", "until")}
+            k = int(r.get("k", 30))
+            if r.get("hybrid"):
+                out[j] = self.query(r["text"], k, query_embedding=embs[j], hybrid=True, **filters)
+                continue
+            where = self._where(**filters)
+            groups.setdefault((k, json.dumps(where, sort_keys=True)), []).append(j)
+
+        for (k, where), idx in groups.items():
+            res = self.collection.query(
+                query_embeddings=[embs[j] for j in idx],
+                n_results=k,
+                where=json.loads(where),
+                include=["documents", "distances", "metadatas"],
+            )
+            for row, j in enumerate(idx):
+                out[j] = self._hits(res, row)
+        return out
+
+    @staticmethod
+    def _hits(res: dict, row: int) -> list[dict]:
+        return [
+            {"id": i, "document": d, "distance": dist, "metadata": m or {}}
+            for i, d, dist, m in zip(
+                res["ids"][row], res["documents"][row], res["distances"][row], res["metadatas"][row]
+            )
+        ]
+
+    def _keyword_hits(self, query_text: str, n: int, where) -> list[dict]:
+        """Candidatos BM25, filtrados con la misma cláusula `where` en Chroma."""
+        ranked = self._keyword_index().search(query_text, n)
+        if not ranked:
+            return []
+        got = self.collection.get(
+            ids=[d for d, _ in ranked], where=where, include=["documents", "metadatas"]
+        )
+        found = {
+            i: {"id": i, "document": d, "distance": None, "metadata": m or {}}
+            for i, d, m in zip(got["ids"], got["documents"], got["metadatas"])
+        }
+        return [found[d] for d, _ in ranked if d in found]
 
-    def query(self, query_text: str, k: int = 30):
-        q_emb = self.embedder.encode([query_text]).tolist()
-        res = self.collection.query(query_embeddings=q_emb, n_results=k)
-        return res["documents"][0]
+    @staticmethod
+    def _fuse(vector_hits: list[dict], keyword_hits: list[dict], k: int, c: int = 60) -> list[dict]:
+        """Reciprocal Rank Fusion de ambos rankings."""
+        fused: dict[str, dict] = {}
+        for ranking in (vector_hits, keyword_hits):
+            for rank, hit in enumerate(ranking):
+                entry = fused.setdefault(hit["id"], {**hit, "score": 0.0})
+                if entry["distance"] is None:
+                    entry["distance"] = hit["distance"]
+                entry["score"] += 1.0 / (c + rank + 1)
+        return sorted(fused.values(), key=lambda h: h["score"], reverse=True)[:k]
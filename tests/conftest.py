@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# `src/` no es un paquete instalable: los tests importan `src.x` desde la raíz del repo
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,130 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from src import answer_cache
+from src.agent import FinancialTweetAgent
+from src.answer_cache import AnswerCache
+from src.benchmark import StubLLM
+from src.keyword_index import tokenize
+
+DIM = 64
+
+
+def embed(text: str) -> np.ndarray:
+    """Bolsa de palabras con hashing: misma lista de palabras ⇒ mismo vector."""
+    v = np.zeros(DIM, dtype=np.float32)
+    for t in tokenize(text):
+        v[int.from_bytes(hashlib.blake2b(t.encode(), digest_size=4).digest(), "little") % DIM] += 1
+    return v / max(np.linalg.norm(v), 1e-12)
+
+
+class FakeDB:
+    """Lo que el agente usa de `VectorDB` para preguntar, sin Chroma ni Mini-LM."""
+
+    def __init__(self, texts):
+        self.path = "unused"
+        self.on_write: list = []
+        self.ids, self.texts, self.embs = [], [], np.zeros((0, DIM), dtype=np.float32)
+        self.add([f"d{i}" for i in range(len(texts))], texts)
+
+    def embed_query(self, text):
+        return embed(text).tolist()
+
+    def add(self, ids, texts, embeddings=None, metadatas=None, **_):
+        embs = np.stack([embed(t) for t in texts])
+        self.ids += list(ids)
+        self.texts += list(texts)
+        self.embs = np.vstack([self.embs, embs])
+        for fn in self.on_write:
+            fn(list(ids), embs)
+
+    def query(self, text, k=30, *, query_embedding=None, **filters):
+        dist = 1.0 - self.embs @ np.asarray(query_embedding, dtype=np.float32)
+        return [
+            {"id": self.ids[i], "document": self.texts[i], "distance": float(dist[i]),
+             "metadata": {"sentiment": "neutral"}}
+            for i in np.argsort(dist)[:k]
+        ]
+
+
+@pytest.fixture
+def agent(tmp_path):
+    agent = FinancialTweetAgent(db_path=str(tmp_path / "chroma_db"), client=StubLLM(), server_url="")
+    agent.db = FakeDB([
+        "NVIDIA beats earnings estimates on data center demand",
+        "Fed holds rates steady and signals patience",
+        "Oil prices slide as OPEC output rises",
+        "Apple unveils new iPhone lineup",
+        "Dividend hikes at big banks after stress test",
+        "Tesla deliveries miss expectations",
+    ])
+    agent.db.on_write.append(agent.answers.invalidate_near)
+    return agent
+
+
+def test_near_identical_question_skips_the_llm(agent):
+    first = agent.insight_hist("¿Qué se dice de NVIDIA?", k=3)
+    assert agent.insight_hist("qué se dice de Nvidia", k=3) == first
+    assert agent.client.calls == 1
+    assert agent.answers.stats()["hits"] == 1
+
+    agent.insight_hist("¿Qué pasa con el petróleo?", k=3)
+    assert agent.client.calls == 2
+
+
+def test_different_filters_or_k_miss(agent):
+    agent.insight_hist("¿Qué se dice de NVIDIA?", k=3)
+    agent.insight_hist("¿Qué se dice de NVIDIA?", k=3, tickers=["NVDA"])
+    agent.insight_hist("¿Qué se dice de NVIDIA?", k=5)
+    assert agent.client.calls == 3
+    # mismos filtros en otro orden ⇒ mismo scope
+    agent.insight_hist("¿Qué se dice de NVIDIA?", k=3, tickers=["NVDA", "AMD"])
+    agent.insight_hist("¿Qué se dice de NVIDIA?", k=3, tickers=["AMD", "NVDA"])
+    assert agent.client.calls == 4
+
+
+def test_new_document_inside_the_radius_invalidates(agent):
+    agent.insight_hist("¿Qué se dice de NVIDIA?", k=3)
+    agent.db.add(["far"], ["Gold futures edge higher in quiet trade"])
+    agent.insight_hist("¿Qué se dice de NVIDIA?", k=3)
+    assert agent.client.calls == 1
+
+    agent.db.add(["near"], ["Qué se dice de NVIDIA hoy"])
+    assert agent.answers.stats()["invalidated"] == 1
+    agent.insight_hist("¿Qué se dice de NVIDIA?", k=3)
+    assert agent.client.calls == 2
+
+
+def test_invalidate_near_only_drops_entries_within_their_radius():
+    cache = AnswerCache()
+    a, b = np.eye(DIM, dtype=np.float32)[:2]
+    cache.put(a, "A", radius=0.3)
+    cache.put(b, "B", radius=0.3)
+    doc = a + 0.2 * b                       # distancia coseno a `a` ≈ 0.02, a `b` ≈ 0.80
+    assert cache.invalidate_near(["x"], doc[None]) == 1
+    assert cache.get(a) is None and cache.get(b) == "B"
+
+
+def test_ttl_expires_entries(monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = AnswerCache(ttl=60)
+    q = np.ones(DIM, dtype=np.float32)
+    cache.put(q, "respuesta")
+    now[0] += 59
+    assert cache.get(q) == "respuesta"
+    now[0] += 2
+    assert cache.get(q) is None and len(cache) == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = AnswerCache(max_entries=2)
+    a, b, c = np.eye(DIM, dtype=np.float32)[:3]
+    cache.put(a, "A")
+    cache.put(b, "B")
+    assert cache.get(a) == "A"              # `a` pasa a ser la más reciente
+    cache.put(c, "C")
+    assert cache.get(b) is None
+    assert cache.get(a) == "A" and cache.get(c) == "C"
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cache import ModelCache, cached_apply
+
+
+def apply(cache, texts):
+    return cached_apply(
+        lambda todo: [t.upper() for t in todo], texts, "test:v1",
+        encode=str.encode, decode=bytes.decode, cache=cache,
+    )
+
+
+def test_cached_apply_only_computes_missing_unique_texts(tmp_path):
+    cache = ModelCache(str(tmp_path / "cache.sqlite"))
+    assert apply(cache, ["a", "b", "a"]) == ["A", "B", "A"]
+    assert apply(cache, ["a", "c"]) == ["A", "C"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 3, 3)
+
+
+def test_counters_add_up_across_threads(tmp_path):
+    cache = ModelCache(str(tmp_path / "cache.sqlite"))
+    batches = [[f"t{i % 50}" for i in range(j, j + 20)] for j in range(200)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda b: apply(cache, b), batches))
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == sum(map(len, batches))
+    assert stats["entries"] == 50
@@ -0,0 +1,64 @@
+from src.dedup import NearDupIndex, same_story
+from src.keyword_index import tokenize
+
+
+def words(text):
+    return frozenset(tokenize(text))
+
+
+def test_same_headline_collapses_and_persists(tmp_path):
+    index = NearDupIndex(tmp_path / "near_dups")
+    text = "AAPL shares rise after strong quarterly earnings beat estimates"
+    assert index.assign(["a", "b"], [text, text + " "]) == ["a", "a"]
+    assert index.copies["a"] == 2
+
+    reloaded = NearDupIndex(tmp_path / "near_dups")
+    assert reloaded.assign(["c"], [text]) == ["a"]
+    assert reloaded.stats() == {"canonical": 1, "docs": 3, "collapsed": 2}
+
+
+def test_polarity_or_number_change_never_collapses(tmp_path):
+    index = NearDupIndex(tmp_path / "near_dups")
+    texts = [
+        "AAPL shares rise after strong quarterly earnings beat estimates",
+        "AAPL shares fall after strong quarterly earnings beat estimates",
+        "Fed minutes signals two cuts this year",
+        "Fed minutes signals no cuts this year",
+        "Fed minutes signals 3 cuts this year",
+    ]
+    assert index.assign(list("abcde"), texts) == list("abcde")
+
+
+def test_same_story_requires_high_exact_jaccard():
+    base = "oil prices steady as traders await opec meeting outcome in vienna this week"
+    assert same_story(words(base), words(base + " reuters"), threshold=0.9)
+    assert not same_story(words(base), words(base + " reuters"), threshold=0.95)
+
+
+def test_different_tickers_never_collapse(tmp_path):
+    index = NearDupIndex(tmp_path / "near_dups")
+    texts = [
+        "CITIBANK UK Regulatory Announcement: FRN Variable Rate Fix",
+        "Citibank UK Regulatory Announcement: FRN Variable Rate Fix",
+        "CITIBANK UK Regulatory Announcement: FRN Variable Rate Fix",
+    ]
+    assert index.assign(["a", "b", "c"], texts) == ["a", "b", "a"]
+
+
+def test_reused_doc_id_with_other_text_is_not_resolved_to_the_old_group(tmp_path):
+    # doc_id posicionales: un segundo parquet sin doc_id reutiliza "0", "1"…
+    index = NearDupIndex(tmp_path / "near_dups")
+    story = "Morgan Stanley raises price target on NVDA after record data center sales"
+    assert index.assign(["0", "1"], [story, story + " "]) == ["0", "0"]
+
+    other = ["KONE Oyj stock exchange release on managers transactions", "Gold edges higher in quiet trade"]
+    assert index.assign(["0", "1"], other) == ["0", "1"]
+    assert index.stats() == {"canonical": 1, "docs": 2, "collapsed": 1}
+
+    # el mismo id con su texto original sigue resolviéndose a su grupo
+    assert index.assign(["1"], [story]) == ["0"]
+    # si el texto nuevo es la misma noticia que otro grupo, se agrupa con él sin registrarse
+    assert index.assign(["g"], [other[1]]) == ["g"]
+    assert index.assign(["1"], [other[1]]) == ["g"]
+    assert index.copies["g"] == 1
+    assert NearDupIndex(tmp_path / "near_dups").assign(["1"], [other[0]]) == ["1"]
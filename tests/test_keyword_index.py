@@ -0,0 +1,42 @@
+from src.keyword_index import KeywordIndex
+
+
+class FakeCollection:
+    """`count` y `get` paginado en orden de inserción, como Chroma."""
+
+    def __init__(self):
+        self.ids, self.docs, self.gets = [], [], 0
+
+    def add(self, ids, docs):
+        self.ids += ids
+        self.docs += docs
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, include, limit, offset):
+        self.gets += 1
+        return {"ids": self.ids[offset : offset + limit], "documents": self.docs[offset : offset + limit]}
+
+
+def test_sync_reads_only_what_other_writers_added():
+    col = FakeCollection()
+    col.add(["a", "b", "c"], ["nvidia earnings beat", "fed holds rates", "oil slides"])
+    index = KeywordIndex()
+    index.sync(col, page=2)
+    assert len(index) == 3 and col.gets == 2
+
+    index.sync(col, page=2)                 # sin escrituras: sólo count()
+    assert col.gets == 2
+
+    col.add(["d"], ["nvidia unveils new chips"])
+    index.sync(col, page=2)
+    assert col.gets == 3
+    assert {d for d, _ in index.search("nvidia")} == {"a", "d"}
+
+
+def test_add_skips_known_ids():
+    index = KeywordIndex()
+    index.add(["a"], ["nvidia earnings beat"])
+    index.add(["a"], ["nvidia earnings beat"])
+    assert len(index) == 1 and index.total_len == 3
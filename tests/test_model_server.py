@@ -0,0 +1,51 @@
+import http.client
+import json
+
+import pytest
+
+from src.model_server import ModelServer, RemoteVectorDB
+
+
+@pytest.fixture
+def server(tmp_path):
+    srv = ModelServer(str(tmp_path / "chroma_db"), port=0).start()
+    yield srv
+    srv.shutdown()
+
+
+def post(srv, op, body: bytes):
+    conn = http.client.HTTPConnection(*srv.httpd.server_address[:2], timeout=10)
+    conn.request("POST", f"/{op}", body=body, headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    return resp.status, json.loads(resp.read())
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"\xff\xfe", b"[1, 2]"])
+def test_malformed_body_returns_400(server, body):
+    status, out = post(server, "sentiment", body)
+    assert status == 400 and "JSON" in out["error"]
+
+
+def test_missing_field_returns_400(server):
+    status, out = post(server, "sentiment", b"{}")
+    assert status == 400 and "texts" in out["error"]
+
+
+class RecordingClient:
+    def __init__(self):
+        self.bodies = []
+
+    def _post(self, op, body):
+        json.dumps(body)                      # lo que haría httpx: falla con sets/tuplas
+        self.bodies.append((op, body))
+        return {"hits": []}
+
+
+def test_remote_query_sends_list_like_filters_as_lists():
+    client = RecordingClient()
+    db = RemoteVectorDB(client)
+    db.query("nvidia", 5, tickers={"NVDA"}, sentiment=("positive", "neutral"), topic="Earnings")
+    _, body = client.bodies[0]
+    assert body["tickers"] == ["NVDA"]
+    assert body["sentiment"] == ["positive", "neutral"]
+    assert body["topic"] == "Earnings"
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.data_pipeline import clean, clean_series, extract_tickers, extract_tickers_series
+
+DEMO = Path(__file__).resolve().parents[1] / "data" / "tweets_fin_2024.parquet"
+
+# URLs, menciones y hashtags pegados a emojis, ZWJ, selectores de variación,
+# espacios y controles Unicode, tickers con acentos o `$` dobles
+EDGE_CASES = [
+    "$AAPL up 3% 🚀🚀 https://t.co/x #earnings @user",
+    "👨\u200d👩\u200d👧 family ❤️ vs ❤︎ and 1️⃣ keycap #️⃣",
+    "café @josé\u00a0\u2003 NVDA\x1c\x0bTSLA\u200b  ",
+    "ABCDEFG $$MSFT BANK $BANK GDPX ÉTATS AMZNé",
+    "http://x😀y @abc😀def #tag😀x",
+    "   ",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def demo_texts() -> pd.Series:
+    if not DEMO.exists():
+        pytest.skip(f"no existe {DEMO}")
+    return pd.concat([pd.read_parquet(DEMO, columns=["text"])["text"], pd.Series(EDGE_CASES)], ignore_index=True)
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_edge_cases_match_scalar_version(text):
+    series = pd.Series([text])
+    assert clean_series(series).tolist() == [clean(text)]
+    assert extract_tickers_series(pd.Series([clean(text)])).tolist() == [extract_tickers(clean(text))]
+
+
+def test_clean_series_matches_clean_on_demo(demo_texts):
+    expected = demo_texts.map(clean)
+    got = clean_series(demo_texts)
+    diff = [i for i, (a, b) in enumerate(zip(expected, got)) if a != b]
+    assert not diff, demo_texts[diff[:5]].tolist()
+
+
+def test_extract_tickers_series_matches_scalar_on_demo(demo_texts):
+    cleaned = demo_texts.map(clean)
+    expected = cleaned.map(extract_tickers)
+    got = extract_tickers_series(cleaned)
+    diff = [i for i, (a, b) in enumerate(zip(expected, got)) if a != b]
+    assert not diff, cleaned[diff[:5]].tolist()
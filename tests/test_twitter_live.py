@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src import twitter_live
+from src.twitter_live import TokenBucket, search, search_since
+
+
+class FakeTwitter(BaseHTTPRequestHandler):
+    """
+    /tweets/search/recent con `total` tweets paginados por `next_token`;
+    uno de cada cinco en español. `failures` es la cola de respuestas de
+    error (429 con reset, 5xx) que se sirven antes que las buenas.
+    """
+
+    total = 250
+    failures: list = []
+    requests: list = []
+
+    def log_message(self, *_):
+        pass
+
+    def _send(self, code, body=b"", headers=()):
+        self.send_response(code)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        type(self).requests.append(q)
+        if type(self).failures:
+            code, headers = type(self).failures.pop(0)
+            self._send(code, b"{}", headers)
+            return
+        start, size = int(q.get("next_token", 0)), int(q["max_results"])
+        newer = [i for i in range(self.total) if i > int(q.get("since_id", -1))]
+        ids = newer[start : start + size]
+        body = {
+            "data": [
+                {"id": str(i), "text": f"tweet {i} $AAPL", "created_at": "2024-05-01T10:00:00.000Z",
+                 "lang": "es" if i % 5 == 0 else "en"}
+                for i in ids
+            ],
+            "meta": {"result_count": len(ids)},
+        }
+        if start + size < len(newer):
+            body["meta"]["next_token"] = str(start + size)
+        self._send(200, json.dumps(body).encode(), [("Content-Type", "application/json")])
+
+
+@pytest.fixture
+def api(monkeypatch):
+    FakeTwitter.failures, FakeTwitter.requests = [], []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTwitter)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(twitter_live, "BACKOFF_S", 0.01)
+    monkeypatch.setattr(twitter_live, "_BUCKET", TokenBucket(rate=1000, capacity=100))
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_paginates_beyond_100_and_drops_non_english(api):
+    tweets = search("AAPL", n=150, base_url=api, bearer="x")
+    assert len(tweets) == 150
+    first, second = FakeTwitter.requests[:2]
+    assert first["max_results"] == "100" and "next_token" not in first
+    assert second["next_token"] == "100"
+    ids = [int(t["doc_id"]) for t in tweets]
+    assert all(i % 5 for i in ids) and ids == sorted(set(ids))
+
+
+def test_n_caps_results_and_requests(api):
+    # la primera página trae 3 en español: se pide otra en vez de devolver 9
+    assert len(search("AAPL", n=12, base_url=api, bearer="x")) == 12
+    assert [r["max_results"] for r in FakeTwitter.requests] == ["12", "10"]
+    assert len(search("AAPL", n=1000, base_url=api, bearer="x")) == 200   # 250 menos los 50 en español
+
+
+def test_429_waits_for_rate_limit_reset_on_the_shared_bucket(api):
+    FakeTwitter.failures = [(429, [("x-rate-limit-reset", str(time.time() + 0.3))])]
+    t0 = time.monotonic()
+    assert len(search("AAPL", n=8, base_url=api, bearer="x")) == 8   # una página: 10 − 2 en español
+    assert time.monotonic() - t0 >= 0.25
+    assert len(FakeTwitter.requests) == 2
+    assert twitter_live._BUCKET.resume_at > t0   # la pausa queda en el bucket del proceso
+
+
+def test_5xx_backs_off_and_retries(api):
+    FakeTwitter.failures = [(503, []), (500, [])]
+    assert len(search("AAPL", n=8, base_url=api, bearer="x")) == 8
+    assert len(FakeTwitter.requests) == 3
+
+
+def test_bucket_budget_persists_across_calls():
+    bucket = TokenBucket(rate=1000, capacity=2)
+    assert bucket._try_take() == 0 and bucket._try_take() == 0
+    assert bucket._try_take() > 0
+    bucket.pause_until(time.time() + 60)
+    assert bucket._try_take() > 50
+
+
+def test_search_since_only_returns_newer_tweets(api):
+    out = search_since({"AAPL -is:retweet": "240", "TSLA -is:retweet": None}, n=500, base_url=api, bearer="x")
+    assert [t["doc_id"] for t in out["AAPL -is:retweet"]] == ["241", "242", "243", "244", "246", "247", "248", "249"]
+    assert len(out["TSLA -is:retweet"]) == 200